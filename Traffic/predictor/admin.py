@@ -1,15 +1,113 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Prediction, SavedScenario
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from .models import Location, NewsArticle, Prediction, SavedScenario, ScenarioForecast, ShadowEvaluation
+from .pagination import EstimatedCountPaginator, decode_cursor, keyset_page
+
+
+# Large-table changelist: estimated counts, cached filter choices and keyset paging
+HIGH_VOLUME_ADMIN = getattr(settings, 'PREDICTION_ADMIN_HIGH_VOLUME', True)
+
+CURSOR_VAR = 'after'
+FILTER_CHOICES_TIMEOUT = 600
+
+
+class CachedChoicesFilter(admin.SimpleListFilter):
+    """List filter whose choices come from field choices or a cached DISTINCT query"""
+
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        field = model_admin.model._meta.get_field(self.field_name)
+        if field.choices:
+            return list(field.flatchoices)
+
+        cache_key = f'admin_choices:{model_admin.model._meta.label_lower}:{self.field_name}'
+        values = cache.get_or_set(
+            cache_key,
+            lambda: list(
+                model_admin.model.objects.order_by(self.field_name)
+                .values_list(self.field_name, flat=True)
+                .distinct()
+            ),
+            FILTER_CHOICES_TIMEOUT,
+        )
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            try:
+                return queryset.filter(**{self.field_name: self.value()})
+            except (ValueError, ValidationError) as e:
+                # Values that are not valid for the field get the admin's "invalid lookup" redirect
+                raise IncorrectLookupParameters(e)
+        return queryset
+
+
+def cached_choices_filter(field_name):
+    """Build a CachedChoicesFilter for one model field"""
+    return type(f'{field_name.title()}CachedFilter', (CachedChoicesFilter,), {
+        'title': field_name.replace('_', ' '),
+        'parameter_name': field_name,
+        'field_name': field_name,
+    })
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that pages by (created_at, id) cursor instead of OFFSET"""
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = decode_cursor(request.GET.get(CURSOR_VAR))
+        self.keyset_mode = False
+        self.next_page_url = None
+        self.result_count_estimated = False
+        super().__init__(request, *args, **kwargs)
+        self.params.pop(CURSOR_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        # Column sorting and "show all" fall back to regular offset pagination
+        if ORDER_VAR in self.params or self.show_all:
+            super().get_results(request)
+            self.result_count_estimated = getattr(self.paginator, 'is_estimated', False)
+            return
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        rows, next_cursor = keyset_page(self.queryset, self.cursor, self.list_per_page)
+
+        self.keyset_mode = True
+        self.result_count = paginator.count
+        self.result_count_estimated = paginator.is_estimated
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = next_cursor is not None or self.cursor is not None
+        self.paginator = paginator
+        self.first_page_url = self.get_query_string(remove=[CURSOR_VAR])
+        if next_cursor:
+            self.next_page_url = self.get_query_string({CURSOR_VAR: next_cursor})
 
 
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
     list_display = ['city', 'source', 'destination', 'congestion_level', 'suggested_mode', 'created_at', 'user']
     list_filter = ['city', 'congestion_level', 'suggested_mode', 'day_type', 'weather', 'created_at']
-    search_fields = ['city', 'source', 'destination']
-    readonly_fields = ['created_at']
-    date_hierarchy = 'created_at'
-    
+    list_select_related = ['user', 'source', 'destination']
+    search_fields = ['source__name', 'destination__name']
+    raw_id_fields = ['source', 'destination']
+    readonly_fields = ['created_at', 'source_lat', 'source_lon', 'dest_lat', 'dest_lon']
+    date_hierarchy = None if HIGH_VOLUME_ADMIN else 'created_at'
+
     fieldsets = (
         ('Basic Information', {
             'fields': ('user', 'city', 'source', 'destination', 'created_at')
@@ -25,11 +123,63 @@ class PredictionAdmin(admin.ModelAdmin):
         }),
     )
 
+    if HIGH_VOLUME_ADMIN:
+        paginator = EstimatedCountPaginator
+        show_full_result_count = False
+        list_filter = [
+            cached_choices_filter('city'),
+            cached_choices_filter('congestion_level'),
+            cached_choices_filter('suggested_mode'),
+            cached_choices_filter('day_type'),
+            cached_choices_filter('weather'),
+            'created_at',
+        ]
+
+        def get_changelist(self, request, **kwargs):
+            return KeysetChangeList
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'latitude', 'longitude', 'geocoded']
+    list_filter = ['geocoded']
+    search_fields = ['name']
+
 
 @admin.register(SavedScenario)
 class SavedScenarioAdmin(admin.ModelAdmin):
     list_display = ['name', 'city', 'source', 'destination', 'user', 'created_at']
     list_filter = ['city', 'created_at']
+    list_select_related = ['user']
     search_fields = ['name', 'city', 'source', 'destination', 'user__username']
     readonly_fields = ['created_at']
     date_hierarchy = 'created_at'
+
+
+@admin.register(ScenarioForecast)
+class ScenarioForecastAdmin(admin.ModelAdmin):
+    list_display = ['scenario', 'weather', 'route_type', 'computed_at']
+    list_select_related = ['scenario']
+    readonly_fields = ['computed_at']
+
+
+@admin.register(ShadowEvaluation)
+class ShadowEvaluationAdmin(admin.ModelAdmin):
+    list_display = ['candidate', 'window_end', 'samples', 'agreement', 'probability_delta',
+                    'primary_ms', 'candidate_ms', 'errors', 'dropped']
+    list_filter = ['candidate', 'candidate_version', 'primary_version']
+    date_hierarchy = 'window_end'
+    
+    @admin.display(description='Agreement')
+    def agreement(self, obj):
+        rate = obj.agreement_rate
+        return '-' if rate is None else f'{rate:.1%}'
+
+
+@admin.register(NewsArticle)
+class NewsArticleAdmin(admin.ModelAdmin):
+    list_display = ['title', 'city', 'source_name', 'published_at', 'fetched_at']
+    list_filter = ['city']
+    search_fields = ['title']
+    readonly_fields = ['fetched_at']
+    date_hierarchy = 'published_at'
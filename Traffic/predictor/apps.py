@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PredictorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'predictor'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import configure_sqlite_connection
+        
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='predictor_sqlite_pragmas')
@@ -0,0 +1,98 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+PAGE_CACHE_TIMEOUT = 60 * 15
+NEWS_CACHE_TIMEOUT = 60 * 15
+
+
+def _namespace_version(namespace, timeout=None):
+    return cache.get_or_set(f'pagecache:version:{namespace}', lambda: int(time.time()), timeout)
+
+
+def cache_version(namespace, timeout=None):
+    """
+    Current version of a cache namespace; doubles as its Last-Modified timestamp.
+
+    Namespaces are hierarchical: 'news:Delhi' is also invalidated by 'news'.
+    With a timeout the namespace rolls over to a new version on its own once
+    it expires, for content that goes stale without an explicit invalidation.
+    """
+    parts = namespace.split(':')
+    versions = [_namespace_version(':'.join(parts[:i])) for i in range(1, len(parts))]
+    versions.append(_namespace_version(namespace, timeout))
+    return max(versions)
+
+
+def invalidate(namespace, timeout=None):
+    """Invalidate every cached page and ETag under a namespace"""
+    key = f'pagecache:version:{namespace}'
+    version = max(int(time.time()), (cache.get(key) or 0) + 1)
+    cache.set(key, version, timeout)
+    return version
+
+
+def invalidate_news(city=None):
+    """Invalidate the cached news list and articles for one city, or for all of them"""
+    if city:
+        invalidate(f'news:{city}', NEWS_CACHE_TIMEOUT)
+    else:
+        invalidate('news')
+
+
+def cached_page(namespace, timeout=PAGE_CACHE_TIMEOUT, version_timeout=None):
+    """
+    Conditional GET and response caching for a view.
+
+    `namespace` is a string or a callable taking the request. Every response
+    gets an ETag and Last-Modified derived from the namespace version, so a
+    repeated request answers 304 without running the view. Anonymous responses
+    are also kept in the cache; authenticated users only get the 304 path
+    because the page chrome shows their username. `version_timeout` is passed
+    on to cache_version().
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            # Pending flash messages make the page one-off
+            if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            ns = namespace(request) if callable(namespace) else namespace
+            version = cache_version(ns, version_timeout)
+            user_key = request.user.pk if request.user.is_authenticated else 'anon'
+            digest = hashlib.md5(f'{ns}:{version}:{request.get_full_path()}:{user_key}'.encode()).hexdigest()
+            etag = f'"{digest}"'
+
+            response = get_conditional_response(request, etag=etag, last_modified=version)
+            if response is None:
+                cache_key = f'pagecache:page:{digest}'
+                cached = cache.get(cache_key) if user_key == 'anon' else None
+                if cached is not None:
+                    response = HttpResponse(cached['content'], content_type=cached['content_type'])
+                else:
+                    response = view_func(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    if user_key == 'anon' and not getattr(response, 'streaming', False):
+                        if hasattr(response, 'render') and callable(response.render):
+                            response.render()
+                        cache.set(cache_key, {
+                            'content': response.content,
+                            'content_type': response['Content-Type'],
+                        }, timeout)
+
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(version)
+            patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,158 @@
+import contextvars
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+REPLICA_ALIAS = 'replica'
+
+# Sessions and accounts are read right after they are written (login), so never from a lagging replica
+PRIMARY_ONLY_APPS = {'auth', 'sessions'}
+
+# Set on responses to requests that wrote; the client reads from the primary while it lasts
+PIN_COOKIE = 'db_primary'
+
+# Set while a read-heavy view runs; the router sends its reads to the replica
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+# Set for requests from clients that wrote recently; overrides _use_replica
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+# Per-request record of whether anything was written, filled in by the router
+_writes = contextvars.ContextVar('request_writes', default=None)
+
+
+def apply_sqlite_pragmas(cursor, pragmas, writable=True):
+    """Run PRAGMA statements on a SQLite cursor; journal_mode needs a writable connection"""
+    for name, value in pragmas.items():
+        if name == 'journal_mode' and not writable:
+            continue
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """connection_created handler applying settings.SQLITE_PRAGMAS to new SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_sqlite_pragmas(cursor, pragmas, writable=connection.alias == DEFAULT_DB_ALIAS)
+
+
+def replica_available():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class RequestWrites:
+    def __init__(self):
+        self.wrote = False
+
+
+class ReadReplicaRouter:
+    """
+    Send reads from views marked with use_read_replica to the replica alias;
+    everything else to default.
+
+    Session and auth models, and every read of a client pinned to the primary
+    after a write, always use default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (_use_replica.get() and not _pinned.get() and replica_available()
+                and model._meta.app_label not in PRIMARY_ONLY_APPS):
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None:
+            writes.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class replica_reads:
+    """Context manager routing ORM reads to the read replica"""
+
+    def __enter__(self):
+        self.token = _use_replica.set(True)
+
+    def __exit__(self, *exc_info):
+        _use_replica.reset(self.token)
+
+
+def use_read_replica(view_func):
+    """Decorator for read-heavy views; writes still go to the default database"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaMiddleware:
+    """
+    Route reads of safe requests under settings.READ_REPLICA_PATHS (e.g. the
+    admin) to the replica, and keep clients that just wrote on the primary.
+
+    A request that writes anything sets PIN_COOKIE for
+    READ_REPLICA_PIN_SECONDS; until it expires the client's reads skip the
+    replica, so it sees its own writes despite replication lag. Install it
+    before the session middleware so session writes are noticed too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(getattr(settings, 'READ_REPLICA_PATHS', ()))
+        self.pin_seconds = getattr(settings, 'READ_REPLICA_PIN_SECONDS', 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = RequestWrites()
+        pinned_token = _pinned.set(PIN_COOKIE in request.COOKIES)
+        writes_token = _writes.set(writes)
+        try:
+            if self.reads_from_replica(request):
+                with replica_reads():
+                    response = self.get_response(request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _writes.reset(writes_token)
+            _pinned.reset(pinned_token)
+        return self.pin(response, writes)
+
+    async def __acall__(self, request):
+        writes = RequestWrites()
+        pinned_token = _pinned.set(PIN_COOKIE in request.COOKIES)
+        writes_token = _writes.set(writes)
+        try:
+            if self.reads_from_replica(request):
+                with replica_reads():
+                    response = await self.get_response(request)
+            else:
+                response = await self.get_response(request)
+        finally:
+            _writes.reset(writes_token)
+            _pinned.reset(pinned_token)
+        return self.pin(response, writes)
+
+    def reads_from_replica(self, request):
+        return request.method in ('GET', 'HEAD') and self.paths and request.path.startswith(self.paths)
+
+    def pin(self, response, writes):
+        if writes.wrote and replica_available():
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
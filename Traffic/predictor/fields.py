@@ -0,0 +1,49 @@
+from django.core import exceptions
+from django.db import models
+from django.utils.functional import cached_property
+
+
+class CodeField(models.PositiveSmallIntegerField):
+    """
+    A string from a fixed vocabulary, stored as its position in `values`.
+
+    Model instances, forms, filters and lookups keep working with the strings
+    (`congestion_level='High'`); only the column holds a small integer. Codes
+    are positions, so new values must be appended to `values`, never inserted.
+    """
+
+    description = 'One of a fixed set of strings, stored as a small integer'
+
+    def __init__(self, *args, values=(), **kwargs):
+        self.values = tuple(values)
+        kwargs['choices'] = [(value, value) for value in self.values]
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop('choices', None)
+        kwargs['values'] = self.values
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        # The integer range validators would compare against the string value
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else self.values[value]
+
+    def to_python(self, value):
+        if value is None or value in self.values:
+            return value
+        if isinstance(value, int) and 0 <= value < len(self.values):
+            return self.values[value]
+        raise exceptions.ValidationError(
+            self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+        )
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        # Unknown values raise ValidationError, which admin filters report as an invalid lookup
+        return self.values.index(self.to_python(value))
@@ -0,0 +1,151 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from predictor.db import apply_sqlite_pragmas
+
+
+SCHEMA = """
+CREATE TABLE prediction (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    created_at TEXT NOT NULL,
+    city TEXT NOT NULL,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    distance_km REAL NOT NULL,
+    hour INTEGER NOT NULL,
+    congestion_level TEXT NOT NULL,
+    suggested_mode TEXT NOT NULL
+);
+CREATE INDEX prediction_user_id ON prediction (user_id);
+"""
+
+CITIES = ['Delhi', 'Mumbai', 'Bengaluru', 'Hyderabad', 'Chennai', 'Kolkata']
+LEVELS = ['Low', 'Medium', 'High']
+USERS = 200
+
+
+def random_row():
+    return (
+        random.randint(1, USERS),
+        time.strftime('%Y-%m-%d %H:%M:%S'),
+        random.choice(CITIES),
+        f'Source {random.randint(1, 500)}',
+        f'Destination {random.randint(1, 500)}',
+        random.uniform(1, 40),
+        random.randint(0, 23),
+        random.choice(LEVELS),
+        random.choice(['Car', 'Metro', 'Bike', 'Walk']),
+    )
+
+
+INSERT = ('INSERT INTO prediction (user_id, created_at, city, source, destination, distance_km, hour, '
+          'congestion_level, suggested_mode) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent SQLite reads/writes with default settings and with SQLITE_PRAGMAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+        parser.add_argument('--readers', type=int, default=4, help='Reader threads (dashboard queries)')
+        parser.add_argument('--writers', type=int, default=2, help='Writer threads (prediction inserts)')
+        parser.add_argument('--rows', type=int, default=20000, help='Rows loaded before each run')
+
+    def handle(self, *args, **options):
+        profiles = [
+            # Django's defaults before the performance profile: rollback journal, 5s timeout
+            ('before', {}, 5),
+            ('after', getattr(settings, 'SQLITE_PRAGMAS', {}), 20),
+        ]
+        self.stdout.write(f"{'profile':<8} {'reads/s':>9} {'writes/s':>9} {'read p99 ms':>12} "
+                          f"{'write p99 ms':>13} {'locked':>7}")
+        for name, pragmas, timeout in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.load(path, options['rows'])
+                result = self.run(path, pragmas, timeout, options)
+            self.stdout.write(
+                f"{name:<8} {result['reads'] / options['seconds']:>9.0f} "
+                f"{result['writes'] / options['seconds']:>9.0f} {result['read_p99']:>12.1f} "
+                f"{result['write_p99']:>13.1f} {result['locked']:>7}"
+            )
+
+    def load(self, path, rows):
+        connection = sqlite3.connect(path)
+        connection.executescript(SCHEMA)
+        connection.executemany(INSERT, (random_row() for _ in range(rows)))
+        connection.commit()
+        connection.close()
+
+    def run(self, path, pragmas, timeout, options):
+        stop = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        result = {'reads': 0, 'writes': 0, 'locked': 0, 'read_times': [], 'write_times': []}
+
+        def connect():
+            # Autocommit like Django, so every statement is its own transaction
+            connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+            apply_sqlite_pragmas(connection.cursor(), pragmas)
+            return connection
+
+        def reader():
+            connection = connect()
+            while time.monotonic() < stop:
+                user_id = random.randint(1, USERS)
+                started = time.perf_counter()
+                try:
+                    # The dashboard's recent list and per-level counts
+                    connection.execute('SELECT * FROM prediction WHERE user_id = ? ORDER BY created_at DESC LIMIT 10',
+                                       (user_id,)).fetchall()
+                    for level in LEVELS:
+                        connection.execute('SELECT COUNT(*) FROM prediction WHERE user_id = ? AND congestion_level = ?',
+                                           (user_id, level)).fetchone()
+                except sqlite3.OperationalError:
+                    with lock:
+                        result['locked'] += 1
+                    continue
+                with lock:
+                    result['reads'] += 1
+                    result['read_times'].append(time.perf_counter() - started)
+            connection.close()
+
+        def writer():
+            connection = connect()
+            while time.monotonic() < stop:
+                started = time.perf_counter()
+                try:
+                    connection.execute(INSERT, random_row())
+                except sqlite3.OperationalError:
+                    with lock:
+                        result['locked'] += 1
+                    continue
+                with lock:
+                    result['writes'] += 1
+                    result['write_times'].append(time.perf_counter() - started)
+            connection.close()
+
+        threads = ([threading.Thread(target=reader) for _ in range(options['readers'])]
+                   + [threading.Thread(target=writer) for _ in range(options['writers'])])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result['read_p99'] = percentile(result['read_times'], 99) * 1000
+        result['write_p99'] = percentile(result['write_times'], 99) * 1000
+        return result
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
@@ -0,0 +1,123 @@
+import os
+import random
+import sqlite3
+import tempfile
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.utils import timezone
+
+
+# Last migration with the string-based Prediction schema
+LEGACY_STATE = ('predictor', '0003_shadowevaluation')
+
+CITIES = ['Delhi', 'Mumbai', 'Bengaluru', 'Hyderabad', 'Chennai', 'Kolkata']
+
+
+class Command(BaseCommand):
+    help = 'Compare table and index sizes of the string and compact Prediction schemas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Predictions to generate')
+        parser.add_argument('--locations', type=int, default=2000, help='Distinct source/destination names')
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        samples = self.generate(options['rows'], options['locations'])
+
+        legacy_apps = MigrationLoader(None, ignore_no_migrations=True).project_state(LEGACY_STATE).apps
+        legacy = self.measure([legacy_apps.get_model('predictor', 'Prediction')], samples, compact=False)
+        current = self.measure([apps.get_model('predictor', 'Location'), apps.get_model('predictor', 'Prediction')],
+                               samples, compact=True)
+
+        self.stdout.write(f"{options['rows']} predictions, {options['locations']} locations")
+        self.stdout.write(f"{'object':<48} {'before KB':>10} {'after KB':>10}")
+        names = sorted(legacy.keys() | current.keys(), key=lambda name: (name not in legacy, name))
+        for name in names:
+            before = f'{legacy[name] / 1024:.0f}' if name in legacy else '-'
+            after = f'{current[name] / 1024:.0f}' if name in current else '-'
+            self.stdout.write(f'{name:<48} {before:>10} {after:>10}')
+        total_before = sum(legacy.values())
+        total_after = sum(current.values())
+        self.stdout.write(f"{'total':<48} {total_before / 1024:>10.0f} {total_after / 1024:>10.0f} "
+                          f"({100 * (1 - total_after / total_before):.0f}% smaller)")
+
+    def generate(self, rows, locations):
+        """Synthetic predictions as dicts of the string values both schemas are built from"""
+        places = {f'Sector {number} Market Road': (random.uniform(8, 37), random.uniform(68, 97))
+                  for number in range(locations)}
+        names = list(places)
+        start = timezone.now() - timedelta(days=365)
+        samples = []
+        for number in range(rows):
+            source, destination = random.sample(names, 2)
+            samples.append({
+                'created_at': start + timedelta(seconds=number * 300),
+                'city': random.choice(CITIES),
+                'source': source,
+                'destination': destination,
+                'source_lat': places[source][0],
+                'source_lon': places[source][1],
+                'dest_lat': places[destination][0],
+                'dest_lon': places[destination][1],
+                'distance_km': random.uniform(1, 40),
+                'hour': random.randint(0, 23),
+                'weekday': random.randint(0, 6),
+                'day_type': random.choice(['weekday', 'weekend', 'holiday']),
+                'weather': random.choice(['Clear', 'Clouds', 'Rain', 'Thunderstorm']),
+                'event_flag': random.random() < 0.2,
+                'route_type': random.choice(['local', 'suburban', 'highway']),
+                'congestion_level': random.choice(['Low', 'Medium', 'High']),
+                'suggested_mode': random.choice(['Car', 'Metro', 'Bike', 'Walk']),
+            })
+        return samples
+
+    def measure(self, models, samples, compact):
+        """Bytes used by each table and index after loading `samples` into a scratch database"""
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'storage.sqlite3'))
+            with connection.schema_editor(collect_sql=True, atomic=False) as editor:
+                for model in models:
+                    editor.create_model(model)
+            for statement in editor.collected_sql:
+                db.execute(statement)
+
+            if compact:
+                Location, Prediction = models
+                location_ids = {}
+                for sample in samples:
+                    for name, lat, lon in ((sample['source'], sample['source_lat'], sample['source_lon']),
+                                           (sample['destination'], sample['dest_lat'], sample['dest_lon'])):
+                        if name not in location_ids:
+                            location_ids[name] = len(location_ids) + 1
+                            self.insert(db, Location(id=location_ids[name], name=name, latitude=lat, longitude=lon))
+                for sample in samples:
+                    values = {key: value for key, value in sample.items()
+                              if key not in ('source', 'destination', 'source_lat', 'source_lon', 'dest_lat', 'dest_lon')}
+                    self.insert(db, Prediction(source_id=location_ids[sample['source']],
+                                               destination_id=location_ids[sample['destination']], **values))
+            else:
+                Prediction, = models
+                for sample in samples:
+                    self.insert(db, Prediction(**sample))
+
+            db.commit()
+            db.execute('VACUUM')
+            tables = [model._meta.db_table for model in models]
+            sizes = db.execute(
+                'SELECT name, SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name IN '
+                f"({', '.join('?' for _ in tables)})) GROUP BY name", tables
+            ).fetchall()
+            db.close()
+        return dict(sizes)
+
+    def insert(self, db, obj):
+        fields = [field for field in obj._meta.concrete_fields if not (field.primary_key and obj.pk is None)]
+        db.execute(
+            f'INSERT INTO "{obj._meta.db_table}" ({", ".join(field.column for field in fields)}) '
+            f'VALUES ({", ".join("?" for _ in fields)})',
+            [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields],
+        )
@@ -0,0 +1,76 @@
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from predictor.services import tiles
+from predictor.services.model import predictor
+
+
+class Command(BaseCommand):
+    help = 'Precompute per-hour congestion heatmap grids for each city'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--city', action='append', dest='cities',
+                            help='City to build (repeatable; default: all cities)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes scoring city/hour grids')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild every hour, even if it matches the current model')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and rebuild whenever the model file changes')
+        parser.add_argument('--interval', type=int, default=300,
+                            help='Seconds between model checks in --watch mode (default: 300)')
+
+    def handle(self, *args, **options):
+        cities = options['cities'] or list(tiles.CITY_BOUNDS)
+        unknown = [city for city in cities if city not in tiles.CITY_BOUNDS]
+        if unknown:
+            raise CommandError(f"Unknown cities: {', '.join(unknown)}")
+
+        self.running = True
+        if options['watch']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        force = options['force']
+        while self.running:
+            self.build(cities, options['workers'], force)
+            force = False
+            if not options['watch']:
+                break
+
+            deadline = time.monotonic() + options['interval']
+            while self.running and time.monotonic() < deadline:
+                time.sleep(1)
+            # Pick up a replaced traffic_model.pkl; its hash becomes the new version
+            predictor.load_model()
+
+    def build(self, cities, workers, force):
+        version = predictor.model_version
+        pending = [(city, hour) for city in cities for hour in tiles.stale_hours(city, version, force)]
+        if not pending:
+            self.stdout.write(f'Heatmap tiles are up to date for model {version}')
+            return
+
+        started = time.monotonic()
+        # Warm the per-city distance grids before forking so workers inherit them
+        for city in {city for city, _ in pending}:
+            tiles.cell_distances(city, tiles.GRID_SIZE)
+
+        with ProcessPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = {pool.submit(tiles.score_city_hour, city, hour): (city, hour) for city, hour in pending}
+            for future in as_completed(futures):
+                city, hour = futures[future]
+                try:
+                    tiles.store_grid(city, hour, future.result(), version)
+                except Exception as e:
+                    self.stderr.write(f'Failed to build {city} {hour}:00: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(pending)} city/hour grids for model {version} in {time.monotonic() - started:.1f}s'
+        ))
+
+    def stop(self, signum, frame):
+        self.running = False
@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from predictor.caching import invalidate, invalidate_news
+
+
+class Command(BaseCommand):
+    help = 'Invalidate cached pages, e.g. after a deploy or a news refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--news', nargs='?', const='', metavar='CITY',
+                            help='Invalidate news pages for one city (all cities when no city is given)')
+        parser.add_argument('--all', action='store_true',
+                            help='Clear the whole cache, including template fragments')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS('Cleared the whole cache'))
+            return
+
+        if options['news'] is not None:
+            invalidate_news(options['news'] or None)
+            self.stdout.write(self.style.SUCCESS(f"Invalidated news pages for {options['news'] or 'all cities'}"))
+            return
+
+        invalidate('pages')
+        self.stdout.write(self.style.SUCCESS('Invalidated static pages'))
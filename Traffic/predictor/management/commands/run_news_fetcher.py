@@ -0,0 +1,51 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from predictor.services.model import CITY_COORDS
+from predictor.services.news import ingest_news
+
+
+class Command(BaseCommand):
+    help = 'Long-running worker that fetches traffic news into the NewsArticle table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=900,
+                            help='Seconds between runs (default: 900)')
+        parser.add_argument('--city', action='append', dest='cities',
+                            help='City to fetch; repeat for several (default: all supported cities)')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single pass and exit')
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        cities = options['cities'] or list(CITY_COORDS)
+
+        while self.running:
+            started = time.monotonic()
+            close_old_connections()
+            for city in cities:
+                if not self.running:
+                    break
+                try:
+                    count = ingest_news(city)
+                    self.stdout.write(f"{city}: {count} new articles")
+                except Exception as e:
+                    self.stderr.write(f"News fetcher error for {city}: {e}")
+
+            if options['once']:
+                break
+            self.sleep(options['interval'] - (time.monotonic() - started))
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + max(seconds, 0)
+        while self.running and time.monotonic() < deadline:
+            time.sleep(max(0, min(1, deadline - time.monotonic())))
+
+    def stop(self, signum, frame):
+        self.stdout.write('Stopping news fetcher')
+        self.running = False
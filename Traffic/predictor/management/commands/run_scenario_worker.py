@@ -0,0 +1,61 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from predictor.models import SavedScenario
+from predictor.services.scenarios import FORECAST_HOURS, precompute_forecasts
+
+
+class Command(BaseCommand):
+    help = 'Long-running worker that precomputes hourly forecasts for saved scenarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=900,
+                            help='Seconds between runs (default: 900)')
+        parser.add_argument('--hours', type=int, default=FORECAST_HOURS,
+                            help=f'Upcoming hours to forecast (default: {FORECAST_HOURS})')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Scenarios scored per batched model call (default: 200)')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single pass and exit')
+        parser.add_argument('--regeocode', action='store_true',
+                            help='Geocode every route again instead of reusing stored coordinates')
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while self.running:
+            started = time.monotonic()
+            try:
+                count = self.run_once(options['hours'], options['batch_size'], options['regeocode'])
+                self.stdout.write(f"Precomputed {count} scenario forecasts in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                self.stderr.write(f"Scenario worker error: {e}")
+
+            if options['once']:
+                break
+            self.sleep(options['interval'] - (time.monotonic() - started))
+
+    def run_once(self, hours, batch_size, regeocode=False):
+        close_old_connections()
+        ids = list(SavedScenario.objects.order_by('id').values_list('id', flat=True))
+        count = 0
+        for start in range(0, len(ids), batch_size):
+            if not self.running:
+                break
+            batch = SavedScenario.objects.filter(id__in=ids[start:start + batch_size])
+            count += precompute_forecasts(batch, hours, regeocode)
+        return count
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + max(seconds, 0)
+        while self.running and time.monotonic() < deadline:
+            time.sleep(max(0, min(1, deadline - time.monotonic())))
+
+    def stop(self, signum, frame):
+        self.stdout.write('Stopping scenario worker')
+        self.running = False
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-19 15:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScenarioForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200)),
+                ('destination', models.CharField(max_length=200)),
+                ('source_lat', models.FloatField()),
+                ('source_lon', models.FloatField()),
+                ('dest_lat', models.FloatField()),
+                ('dest_lon', models.FloatField()),
+                ('distance_km', models.FloatField()),
+                ('route_type', models.CharField(max_length=50)),
+                ('weather', models.CharField(max_length=100)),
+                ('hourly', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='predictor.savedscenario')),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-19 15:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0002_scenarioforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowEvaluation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidate', models.CharField(max_length=100)),
+                ('candidate_version', models.CharField(max_length=12)),
+                ('primary_version', models.CharField(max_length=12)),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField(default=django.utils.timezone.now)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('agreements', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('dropped', models.PositiveIntegerField(default=0)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('probability_delta', models.FloatField(default=0)),
+                ('primary_ms', models.FloatField(default=0)),
+                ('candidate_ms', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['-window_end'],
+                'indexes': [models.Index(fields=['candidate', 'window_end'], name='predictor_s_candida_d39417_idx')],
+            },
+        ),
+    ]
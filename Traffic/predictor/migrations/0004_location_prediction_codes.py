@@ -0,0 +1,125 @@
+# Generated by Django 5.0.2 on 2026-10-19 17:05
+
+import django.db.models.deletion
+import predictor.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0003_shadowevaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='city_code',
+            field=predictor.fields.CodeField(null=True, values=('Delhi', 'Mumbai', 'Bengaluru', 'Hyderabad', 'Chennai', 'Kolkata')),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='source_location',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='predictor.location'),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='destination_location',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='predictor.location'),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='day_type_code',
+            field=predictor.fields.CodeField(null=True, values=('weekday', 'weekend', 'holiday')),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='weather_code',
+            field=predictor.fields.CodeField(null=True, values=('Clear', 'Clouds', 'Rain', 'Drizzle', 'Thunderstorm', 'Snow', 'Mist', 'Smoke', 'Haze', 'Dust', 'Fog', 'Sand', 'Ash', 'Squall', 'Tornado')),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='route_type_code',
+            field=predictor.fields.CodeField(null=True, values=('local', 'suburban', 'highway')),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='congestion_level_code',
+            field=predictor.fields.CodeField(null=True, values=('Low', 'Medium', 'High')),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='suggested_mode_code',
+            field=predictor.fields.CodeField(null=True, values=('Car', 'Metro', 'Bike', 'Walk')),
+        ),
+        # The string columns become nullable so the conversion can be reversed
+        migrations.AlterField(
+            model_name='prediction',
+            name='city',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='source',
+            field=models.CharField(max_length=200, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='destination',
+            field=models.CharField(max_length=200, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='source_lat',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='source_lon',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='dest_lat',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='dest_lon',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='day_type',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='weather',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='route_type',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='congestion_level',
+            field=models.CharField(choices=[('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High')], max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='suggested_mode',
+            field=models.CharField(choices=[('Car', 'Car'), ('Metro', 'Metro'), ('Bike', 'Bike'), ('Walk', 'Walk')], max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,91 @@
+from django.db import migrations
+
+
+# Rows converted per query, so large tables are not loaded into memory at once
+BATCH_SIZE = 2000
+
+CODE_FIELDS = ['city', 'day_type', 'weather', 'route_type', 'congestion_level', 'suggested_mode']
+
+
+def batches(queryset):
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def locations_for(Location, db, coordinates):
+    """Location rows for {name: (lat, lon)}, creating the missing ones with the given coordinates"""
+    locations = {location.name: location
+                 for location in Location.objects.using(db).filter(name__in=list(coordinates))}
+    missing = [Location(name=name, latitude=lat, longitude=lon)
+               for name, (lat, lon) in coordinates.items() if name not in locations]
+    Location.objects.using(db).bulk_create(missing)
+    locations.update({location.name: location
+                      for location in Location.objects.using(db).filter(name__in=[location.name for location in missing])})
+    return locations
+
+
+def forwards(apps, schema_editor):
+    Prediction = apps.get_model('predictor', 'Prediction')
+    Location = apps.get_model('predictor', 'Location')
+    db = schema_editor.connection.alias
+
+    for batch in batches(Prediction.objects.using(db)):
+        coordinates = {}
+        for prediction in batch:
+            coordinates.setdefault(prediction.source.strip(), (prediction.source_lat, prediction.source_lon))
+            coordinates.setdefault(prediction.destination.strip(), (prediction.dest_lat, prediction.dest_lon))
+        locations = locations_for(Location, db, coordinates)
+
+        for prediction in batch:
+            for name in CODE_FIELDS:
+                code_field = Prediction._meta.get_field(f'{name}_code')
+                value = getattr(prediction, name)
+                if value not in code_field.values:
+                    raise ValueError(
+                        f"Prediction {prediction.pk} has {name} {value!r}; add it to Prediction's "
+                        f"vocabulary before migrating"
+                    )
+                setattr(prediction, f'{name}_code', value)
+            prediction.source_location = locations[prediction.source.strip()]
+            prediction.destination_location = locations[prediction.destination.strip()]
+
+        Prediction.objects.using(db).bulk_update(
+            batch, [f'{name}_code' for name in CODE_FIELDS] + ['source_location', 'destination_location']
+        )
+
+
+def backwards(apps, schema_editor):
+    Prediction = apps.get_model('predictor', 'Prediction')
+    db = schema_editor.connection.alias
+
+    queryset = Prediction.objects.using(db).select_related('source_location', 'destination_location')
+    for batch in batches(queryset):
+        for prediction in batch:
+            for name in CODE_FIELDS:
+                setattr(prediction, name, getattr(prediction, f'{name}_code'))
+            prediction.source = prediction.source_location.name
+            prediction.source_lat = prediction.source_location.latitude
+            prediction.source_lon = prediction.source_location.longitude
+            prediction.destination = prediction.destination_location.name
+            prediction.dest_lat = prediction.destination_location.latitude
+            prediction.dest_lon = prediction.destination_location.longitude
+
+        Prediction.objects.using(db).bulk_update(
+            batch, CODE_FIELDS + ['source', 'source_lat', 'source_lon', 'destination', 'dest_lat', 'dest_lon']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0004_location_prediction_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
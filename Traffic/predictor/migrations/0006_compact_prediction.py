@@ -0,0 +1,75 @@
+# Generated by Django 5.0.2 on 2026-10-19 17:05
+
+import django.db.models.deletion
+import predictor.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0005_convert_prediction_rows'),
+    ]
+
+    operations = [
+        migrations.RemoveField(model_name='prediction', name='city'),
+        migrations.RemoveField(model_name='prediction', name='source'),
+        migrations.RemoveField(model_name='prediction', name='destination'),
+        migrations.RemoveField(model_name='prediction', name='source_lat'),
+        migrations.RemoveField(model_name='prediction', name='source_lon'),
+        migrations.RemoveField(model_name='prediction', name='dest_lat'),
+        migrations.RemoveField(model_name='prediction', name='dest_lon'),
+        migrations.RemoveField(model_name='prediction', name='day_type'),
+        migrations.RemoveField(model_name='prediction', name='weather'),
+        migrations.RemoveField(model_name='prediction', name='route_type'),
+        migrations.RemoveField(model_name='prediction', name='congestion_level'),
+        migrations.RemoveField(model_name='prediction', name='suggested_mode'),
+        migrations.RenameField(model_name='prediction', old_name='city_code', new_name='city'),
+        migrations.RenameField(model_name='prediction', old_name='source_location', new_name='source'),
+        migrations.RenameField(model_name='prediction', old_name='destination_location', new_name='destination'),
+        migrations.RenameField(model_name='prediction', old_name='day_type_code', new_name='day_type'),
+        migrations.RenameField(model_name='prediction', old_name='weather_code', new_name='weather'),
+        migrations.RenameField(model_name='prediction', old_name='route_type_code', new_name='route_type'),
+        migrations.RenameField(model_name='prediction', old_name='congestion_level_code', new_name='congestion_level'),
+        migrations.RenameField(model_name='prediction', old_name='suggested_mode_code', new_name='suggested_mode'),
+        migrations.AlterField(
+            model_name='prediction',
+            name='city',
+            field=predictor.fields.CodeField(values=('Delhi', 'Mumbai', 'Bengaluru', 'Hyderabad', 'Chennai', 'Kolkata')),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='source',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='predictor.location'),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='destination',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='predictor.location'),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='day_type',
+            field=predictor.fields.CodeField(values=('weekday', 'weekend', 'holiday')),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='weather',
+            field=predictor.fields.CodeField(values=('Clear', 'Clouds', 'Rain', 'Drizzle', 'Thunderstorm', 'Snow', 'Mist', 'Smoke', 'Haze', 'Dust', 'Fog', 'Sand', 'Ash', 'Squall', 'Tornado')),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='route_type',
+            field=predictor.fields.CodeField(values=('local', 'suburban', 'highway')),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='congestion_level',
+            field=predictor.fields.CodeField(values=('Low', 'Medium', 'High')),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='suggested_mode',
+            field=predictor.fields.CodeField(values=('Car', 'Metro', 'Bike', 'Walk')),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.0.2 on 2026-10-19 16:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# External-content FTS5 index over title, description and content, kept in
+# sync by triggers. Django rebuilds SQLite tables for most AlterField/RemoveField
+# operations, which drops the triggers: a later migration that touches
+# predictor_newsarticle must run create_fts_index again.
+FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS predictor_newsarticle_fts USING fts5(
+        title, description, content,
+        content='predictor_newsarticle', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS predictor_newsarticle_fts_insert AFTER INSERT ON predictor_newsarticle BEGIN
+        INSERT INTO predictor_newsarticle_fts(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS predictor_newsarticle_fts_delete AFTER DELETE ON predictor_newsarticle BEGIN
+        INSERT INTO predictor_newsarticle_fts(predictor_newsarticle_fts, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS predictor_newsarticle_fts_update AFTER UPDATE ON predictor_newsarticle BEGIN
+        INSERT INTO predictor_newsarticle_fts(predictor_newsarticle_fts, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description, old.content);
+        INSERT INTO predictor_newsarticle_fts(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, new.content);
+    END""",
+    "INSERT INTO predictor_newsarticle_fts(predictor_newsarticle_fts) VALUES ('rebuild')",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    # Other databases search with icontains (predictor.services.news.search_articles)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS predictor_newsarticle_fts_{name}')
+    schema_editor.execute('DROP TABLE IF EXISTS predictor_newsarticle_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0006_compact_prediction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('url', models.CharField(max_length=500, unique=True)),
+                ('title', models.CharField(max_length=300)),
+                ('description', models.TextField(blank=True)),
+                ('content', models.TextField(blank=True)),
+                ('source_name', models.CharField(blank=True, max_length=200)),
+                ('published_at', models.DateTimeField()),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-published_at', '-id'],
+                'indexes': [models.Index(fields=['city', '-published_at', '-id'], name='predictor_n_city_338879_idx'), models.Index(fields=['-published_at', '-id'], name='predictor_n_publish_53c454_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
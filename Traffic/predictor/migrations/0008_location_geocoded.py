@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0007_newsarticle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geocoded',
+            field=models.BooleanField(default=False),
+        ),
+    ]
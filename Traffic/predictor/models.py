@@ -1,46 +1,86 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils import timezone
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from .fields import CodeField
+
+
+class Location(models.Model):
+    """A source or destination, stored once with its latest geocoded coordinates"""
+    name = models.CharField(max_length=200, unique=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    # False while the coordinates are a fallback; only geocoded rows are reused instead of Nominatim
+    geocoded = models.BooleanField(default=False)
+    
+    def __str__(self):
+        return self.name
+    
+    @classmethod
+    def remember(cls, name, coords, geocoded=True):
+        """Location for a name; a successful geocode replaces previously stored coordinates"""
+        latitude, longitude = (float(value) for value in coords)
+        location, created = cls.objects.get_or_create(
+            name=name.strip(), defaults={'latitude': latitude, 'longitude': longitude, 'geocoded': geocoded}
+        )
+        if not created and geocoded and (
+                not location.geocoded or (location.latitude, location.longitude) != (latitude, longitude)):
+            location.latitude, location.longitude, location.geocoded = latitude, longitude, True
+            location.save(update_fields=['latitude', 'longitude', 'geocoded'])
+        return location
 
 
 class Prediction(models.Model):
-    CONGESTION_CHOICES = [
-        ('Low', 'Low'),
-        ('Medium', 'Medium'),
-        ('High', 'High'),
-    ]
-    
-    MODE_CHOICES = [
-        ('Car', 'Car'),
-        ('Metro', 'Metro'),
-        ('Bike', 'Bike'),
-        ('Walk', 'Walk'),
-    ]
+    # Stored as small-integer codes: append new values, never reorder
+    CITIES = ('Delhi', 'Mumbai', 'Bengaluru', 'Hyderabad', 'Chennai', 'Kolkata')
+    DAY_TYPES = ('weekday', 'weekend', 'holiday')
+    # OpenWeather "main" conditions
+    WEATHER = ('Clear', 'Clouds', 'Rain', 'Drizzle', 'Thunderstorm', 'Snow', 'Mist', 'Smoke',
+               'Haze', 'Dust', 'Fog', 'Sand', 'Ash', 'Squall', 'Tornado')
+    ROUTE_TYPES = ('local', 'suburban', 'highway')
+    CONGESTION_LEVELS = ('Low', 'Medium', 'High')
+    MODES = ('Car', 'Metro', 'Bike', 'Walk')
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
-    city = models.CharField(max_length=100)
-    source = models.CharField(max_length=200)
-    destination = models.CharField(max_length=200)
-    source_lat = models.FloatField()
-    source_lon = models.FloatField()
-    dest_lat = models.FloatField()
-    dest_lon = models.FloatField()
+    city = CodeField(values=CITIES)
+    # Predictions are listed by user and time, never by location, so no FK indexes
+    source = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='+', db_index=False)
+    destination = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='+', db_index=False)
     distance_km = models.FloatField()
     hour = models.IntegerField()
     weekday = models.IntegerField()
-    day_type = models.CharField(max_length=50)
-    weather = models.CharField(max_length=100)
+    day_type = CodeField(values=DAY_TYPES)
+    weather = CodeField(values=WEATHER)
     event_flag = models.BooleanField(default=False)
-    route_type = models.CharField(max_length=50)
-    congestion_level = models.CharField(max_length=10, choices=CONGESTION_CHOICES)
-    suggested_mode = models.CharField(max_length=10, choices=MODE_CHOICES)
+    route_type = CodeField(values=ROUTE_TYPES)
+    congestion_level = CodeField(values=CONGESTION_LEVELS)
+    suggested_mode = CodeField(values=MODES)
     
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.city}: {self.source} → {self.destination} ({self.congestion_level})"
+    
+    @property
+    def source_lat(self):
+        return self.source.latitude
+    
+    @property
+    def source_lon(self):
+        return self.source.longitude
+    
+    @property
+    def dest_lat(self):
+        return self.destination.latitude
+    
+    @property
+    def dest_lon(self):
+        return self.destination.longitude
 
 
 class SavedScenario(models.Model):
@@ -56,3 +96,112 @@ class SavedScenario(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.city}"
+    
+    @property
+    def current_forecast(self):
+        """The precomputed forecast if it was made for the scenario's current route, else None"""
+        try:
+            forecast = self.forecast
+        except ScenarioForecast.DoesNotExist:
+            return None
+        if (forecast.source, forecast.destination) != (self.source, self.destination):
+            return None
+        return forecast
+
+
+class ScenarioForecast(models.Model):
+    """Latest precomputed hourly forecast for a SavedScenario, written by the scenario worker"""
+    scenario = models.OneToOneField(SavedScenario, on_delete=models.CASCADE, related_name='forecast')
+    # Route the cached coordinates were geocoded for
+    source = models.CharField(max_length=200)
+    destination = models.CharField(max_length=200)
+    source_lat = models.FloatField()
+    source_lon = models.FloatField()
+    dest_lat = models.FloatField()
+    dest_lon = models.FloatField()
+    distance_km = models.FloatField()
+    route_type = models.CharField(max_length=50)
+    weather = models.CharField(max_length=100)
+    # [{'time': iso, 'hour': 8, 'congestion_level': 'High', 'suggested_mode': 'Metro', 'probabilities': [...]}, ...]
+    hourly = models.JSONField(default=list)
+    computed_at = models.DateTimeField(default=timezone.now)
+    
+    STALE_AFTER = timedelta(minutes=30)
+    
+    def __str__(self):
+        return f"Forecast for {self.scenario} ({self.computed_at:%Y-%m-%d %H:%M})"
+    
+    @property
+    def age_seconds(self):
+        return int((timezone.now() - self.computed_at).total_seconds())
+    
+    @property
+    def is_stale(self):
+        return timezone.now() - self.computed_at > self.STALE_AFTER
+    
+    def upcoming(self):
+        """Hourly entries that have not passed yet"""
+        cutoff = (timezone.now() - timedelta(hours=1)).isoformat()
+        return [entry for entry in self.hourly if entry['time'] > cutoff]
+
+
+class ShadowEvaluation(models.Model):
+    """Agreement and latency of a candidate model against the live model over one window"""
+    candidate = models.CharField(max_length=100)
+    candidate_version = models.CharField(max_length=12)
+    primary_version = models.CharField(max_length=12)
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField(default=timezone.now)
+    samples = models.PositiveIntegerField(default=0)
+    agreements = models.PositiveIntegerField(default=0)
+    # Samples the candidate failed on, and samples dropped because the queue was full
+    errors = models.PositiveIntegerField(default=0)
+    dropped = models.PositiveIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    # Means per sample: absolute class probability difference, live and candidate inference time
+    probability_delta = models.FloatField(default=0)
+    primary_ms = models.FloatField(default=0)
+    candidate_ms = models.FloatField(default=0)
+    
+    class Meta:
+        ordering = ['-window_end']
+        indexes = [models.Index(fields=['candidate', 'window_end'])]
+    
+    def __str__(self):
+        return f"{self.candidate} vs {self.primary_version} ({self.window_end:%Y-%m-%d %H:%M})"
+    
+    @property
+    def agreement_rate(self):
+        return self.agreements / self.samples if self.samples else None
+
+
+class NewsArticle(models.Model):
+    """A traffic news article stored by the news fetcher; full-text indexed on SQLite"""
+    # Synthetic articles have no real URL; this prefix plus city and number keeps them unique
+    SYNTHETIC_PREFIX = 'synthetic://'
+    
+    city = models.CharField(max_length=100)
+    url = models.CharField(max_length=500, unique=True)
+    title = models.CharField(max_length=300)
+    description = models.TextField(blank=True)
+    content = models.TextField(blank=True)
+    source_name = models.CharField(max_length=200, blank=True)
+    published_at = models.DateTimeField()
+    fetched_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-published_at', '-id']
+        indexes = [
+            models.Index(fields=['city', '-published_at', '-id']),
+            models.Index(fields=['-published_at', '-id']),
+        ]
+    
+    def __str__(self):
+        return self.title
+    
+    def get_absolute_url(self):
+        return f"{reverse('news_detail', args=[self.pk])}?{urlencode({'city': self.city})}"
+    
+    @property
+    def is_synthetic(self):
+        return self.url.startswith(self.SYNTHETIC_PREFIX)
@@ -0,0 +1,91 @@
+import base64
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+# Filtered changelists never count past this many rows
+COUNT_CAP = 10000
+
+
+def estimate_row_count(model, using='default'):
+    """Cheap row count estimate for a whole table, without a full COUNT(*)"""
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            if row and row[0] > 0:
+                return int(row[0])
+        elif connection.vendor == 'sqlite':
+            # Populated by ANALYZE; the first number of every stat row is the table size
+            try:
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+            except Exception:
+                pass
+            # MAX(rowid) is an index lookup and an upper bound when rows are only appended
+            cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+            row = cursor.fetchone()
+            return int(row[0] or 0)
+
+    return model._default_manager.using(using).count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates unfiltered totals and caps filtered counts"""
+
+    count_cap = COUNT_CAP
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            return estimate_row_count(self.object_list.model, self.object_list.db)
+        return self.object_list.order_by()[:self.count_cap].count()
+
+    @cached_property
+    def is_estimated(self):
+        return not self.object_list.query.where or self.count >= self.count_cap
+
+
+def encode_cursor(value, pk):
+    """Encode a (timestamp, pk) keyset position as an opaque URL-safe token"""
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token, returning None when it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        value = parse_datetime(value)
+        if value is None:
+            return None
+        return value, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(queryset, cursor, per_page, field='created_at'):
+    """Return one page of a queryset ordered by (-field, -pk) and the cursor for the next page"""
+    if cursor:
+        value, pk = cursor
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(getattr(rows[-1], field), rows[-1].pk)
+    return rows, next_cursor
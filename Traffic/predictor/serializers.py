@@ -0,0 +1,108 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+
+
+# Bump when a field is renamed, removed or changes meaning
+SCHEMA_VERSION = 1
+
+PREDICTION_FIELDS = (
+    'congestion_level',
+    'suggested_mode',
+    'probabilities',
+    'distance_km',
+    'route_type',
+    'weather',
+    'hour',
+    'day_type',
+    'coordinates',
+    'degraded',
+    'degraded_stages',
+    'features',
+)
+
+# Returned when the client does not ask for specific fields; the full
+# feature dict is opt-in via ?fields=features
+DEFAULT_FIELDS = PREDICTION_FIELDS[:-1]
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class PredictionJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder that also understands NumPy scalars and arrays"""
+
+    def default(self, o):
+        if hasattr(o, 'tolist'):
+            return o.tolist()
+        return super().default(o)
+
+
+def parse_fields(value):
+    """Parse a comma separated ?fields= value, or a JSON list of names, into a tuple of prediction fields"""
+    if value is None:
+        return DEFAULT_FIELDS
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(field, str) for field in value):
+        raise InvalidFields('fields must be a comma separated string or a list of strings')
+    fields = tuple(field.strip() for field in value if field.strip())
+    if not fields:
+        return DEFAULT_FIELDS
+    unknown = [field for field in fields if field not in PREDICTION_FIELDS]
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def serialize_prediction(result, fields=DEFAULT_FIELDS):
+    """
+    Versioned, JSON-ready dict for a predict_traffic result.
+
+    Values are converted to plain Python types up front so that encoding
+    never falls back to the encoder's per-object default() hook.
+    """
+    features = result['features']
+    source = result['coordinates']['source']
+    destination = result['coordinates']['destination']
+    getters = {
+        'congestion_level': lambda: str(result['congestion_level']),
+        'suggested_mode': lambda: result['suggested_mode'],
+        'probabilities': lambda: [round(float(p), 4) for p in result['probabilities']],
+        'distance_km': lambda: None if features['distance_km'] is None else round(float(features['distance_km']), 3),
+        'route_type': lambda: features['route_type'],
+        'weather': lambda: features['weather'],
+        'hour': lambda: int(features['hour']),
+        'day_type': lambda: features['day_type'],
+        'coordinates': lambda: {
+            'source': [float(source[0]), float(source[1])],
+            'destination': [float(destination[0]), float(destination[1])],
+        },
+        'degraded': lambda: bool(result.get('degraded', False)),
+        'degraded_stages': lambda: list(result.get('degraded_stages', [])),
+        'features': lambda: {key: value.item() if hasattr(value, 'item') else value
+                             for key, value in features.items()},
+    }
+    data = {'version': SCHEMA_VERSION}
+    for field in fields:
+        data[field] = getters[field]()
+    return data
+
+
+def serialize_rows(rows, columns):
+    """Column-oriented encoding for a list of dicts: one header plus one array per row"""
+    return {
+        'version': SCHEMA_VERSION,
+        'columns': list(columns),
+        'rows': [[row.get(column) for column in columns] for row in rows],
+    }
+
+
+def api_response(data, status=200):
+    """Compact JsonResponse (no whitespace) using PredictionJSONEncoder"""
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=PredictionJSONEncoder,
+        json_dumps_params={'separators': (',', ':')},
+    )
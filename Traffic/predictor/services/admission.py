@@ -0,0 +1,157 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .model import predictor
+
+
+DEFAULTS = {
+    'RATE': 1.0,            # tokens added per second, per client
+    'BURST': 10,            # bucket size, per client
+    'MAX_CONCURRENT': 8,    # full predictions running at once, per process
+    'QUEUE_TIMEOUT': 0.5,   # seconds to wait for a free slot before shedding
+    'SHED_MODE': 'degrade', # 'degrade' to the fallback prediction, or 'reject' with 429
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'PREDICTION_ADMISSION', {}).get(name, DEFAULTS[name])
+
+
+class RateLimited(Exception):
+    """Raised when a request is refused; `retry_after` is in seconds"""
+
+    def __init__(self, retry_after, reason='rate_limited'):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets, kept in process memory"""
+
+    max_clients = 10000
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def allow(self, client):
+        """Take a token for `client`; returns 0 when allowed, else seconds until the next token"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self.buckets[client] = (tokens - 1, now)
+                if len(self.buckets) > self.max_clients:
+                    self._prune(now)
+                return 0
+            self.buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full = [client for client, (tokens, last) in self.buckets.items()
+                if tokens + (now - last) * self.rate >= self.burst]
+        for client in full:
+            del self.buckets[client]
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight full predictions; callers wait at most `timeout` for a slot"""
+
+    def __init__(self, limit, timeout):
+        self.timeout = timeout
+        self.semaphore = threading.BoundedSemaphore(limit)
+
+    def acquire(self, timeout=None):
+        return self.semaphore.acquire(timeout=self.timeout if timeout is None else min(timeout, self.timeout))
+
+    def release(self):
+        self.semaphore.release()
+
+
+class AdmissionStats:
+    """Thread-safe counters for admitted, degraded, shed and rate-limited requests"""
+
+    names = ('admitted', 'degraded', 'shed', 'rate_limited')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(self.names, 0)
+
+    def incr(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+rate_limiter = TokenBucketLimiter(get_setting('RATE'), get_setting('BURST'))
+concurrency_limiter = ConcurrencyLimiter(get_setting('MAX_CONCURRENT'), get_setting('QUEUE_TIMEOUT'))
+stats = AdmissionStats()
+
+
+def client_key(request):
+    """Rate limit authenticated users by account and everyone else by address"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def admit_prediction(request, city, source, destination, deadline=None):
+    """Run predictor.predict_traffic for a web request under admission control"""
+    return admit(client_key(request), city, source, destination, deadline)
+
+
+def admit(client, city, source, destination, deadline=None):
+    """
+    Run predictor.predict_traffic under admission control.
+
+    Clients over their rate limit get RateLimited. When every prediction slot
+    is busy the request is shed: it either gets the degraded prediction (no
+    upstream calls, no model inference) or RateLimited, depending on SHED_MODE.
+    Routes without cached coordinates always get RateLimited when shed.
+    Time spent waiting for a slot counts against `deadline`.
+    """
+    return _admit(client, deadline,
+                  lambda: predictor.predict_traffic(city, source, destination, deadline),
+                  lambda: predictor.predict_traffic_degraded(city, source, destination))
+
+
+def admit_city(client, city, distance, deadline=None):
+    """Run predictor.predict_city under the same admission control as admit()"""
+    return _admit(client, deadline,
+                  lambda: predictor.predict_city(city, distance, deadline),
+                  lambda: predictor.predict_city_degraded(city, distance))
+
+
+def _admit(client, deadline, predict, predict_degraded):
+    retry_after = rate_limiter.allow(client)
+    if retry_after:
+        stats.incr('rate_limited')
+        raise RateLimited(retry_after)
+
+    if not concurrency_limiter.acquire(deadline.timeout() if deadline else None):
+        if get_setting('SHED_MODE') == 'reject':
+            stats.incr('shed')
+            raise RateLimited(concurrency_limiter.timeout, reason='overloaded')
+        result = predict_degraded()
+        if result is None:
+            # Nothing cached for this route, so there is no quick estimate worth giving
+            stats.incr('shed')
+            raise RateLimited(concurrency_limiter.timeout, reason='overloaded')
+        stats.incr('degraded')
+        return result
+
+    try:
+        stats.incr('admitted')
+        return predict()
+    finally:
+        concurrency_limiter.release()
@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'DEFAULT': 3.0,             # seconds, when the caller does not ask for a budget
+    'MAX': 10.0,                # upper bound for budgets requested by API clients
+    'INFERENCE_RESERVE': 0.05,  # seconds kept back from upstream calls for the model
+}
+
+# Budget requested by API clients, in milliseconds
+BUDGET_HEADER = 'X-Latency-Budget-Ms'
+
+
+def get_setting(name):
+    return getattr(settings, 'PREDICTION_LATENCY_BUDGET', {}).get(name, DEFAULTS[name])
+
+
+class InvalidBudget(ValueError):
+    pass
+
+
+class Deadline:
+    """A point in time a prediction must finish by; `seconds=None` means no limit"""
+
+    def __init__(self, seconds=None):
+        self.budget = seconds
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        """Seconds left, or None without a limit"""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self, reserve=0.0):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= reserve
+
+    def timeout(self, cap=None, reserve=0.0):
+        """Timeout for one blocking call: the time left minus `reserve`, at most `cap`"""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        remaining = max(0.0, remaining - reserve)
+        return remaining if cap is None else min(cap, remaining)
+
+
+def deadline_from_request(request):
+    """
+    Deadline for a prediction request, starting now.
+
+    API clients may ask for a budget with the X-Latency-Budget-Ms header; it is
+    capped at MAX. Without the header the DEFAULT budget applies.
+    """
+    value = request.headers.get(BUDGET_HEADER)
+    if value is None:
+        return Deadline(get_setting('DEFAULT'))
+    try:
+        budget = float(value) / 1000
+    except ValueError:
+        raise InvalidBudget(f'{BUDGET_HEADER} must be a number of milliseconds')
+    if not budget > 0:
+        raise InvalidBudget(f'{BUDGET_HEADER} must be positive')
+    return Deadline(min(budget, get_setting('MAX')))
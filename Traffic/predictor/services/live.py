@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..serializers import PredictionJSONEncoder, serialize_prediction
+from . import admission, tiles
+from .deadline import Deadline, get_setting as get_budget_setting
+
+
+# Seconds between predictions for one city/route, and between keepalive comments
+LIVE_INTERVAL = getattr(settings, 'LIVE_CONGESTION_INTERVAL', 60)
+KEEPALIVE_INTERVAL = 15
+# Distinct city/route feeds running at once, per process
+MAX_FEEDS = getattr(settings, 'LIVE_CONGESTION_MAX_FEEDS', 50)
+
+LIVE_FIELDS = ('congestion_level', 'suggested_mode', 'probabilities', 'weather', 'hour', 'degraded', 'degraded_stages')
+# A city-wide reading is not a trip anyone takes, so it suggests no mode
+CITY_FIELDS = tuple(field for field in LIVE_FIELDS if field != 'suggested_mode')
+
+
+class LiveFeed:
+    """
+    One periodic prediction for a city/route, fanned out to every subscriber.
+    City-wide feeds have no source or destination in their key.
+
+    The producer task starts with the first subscriber and stops with the
+    last, so N watchers of the same route cost one prediction per tick.
+    Each subscriber queue holds only the newest update; slow readers skip
+    ticks instead of buffering them.
+    """
+
+    def __init__(self, key, interval=LIVE_INTERVAL):
+        self.key = key
+        self.interval = interval
+        self.subscribers = set()
+        self.task = None
+        self.latest = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            if self.task is not None:
+                self.task.cancel()
+                self.task = None
+            feeds.pop(self.key, None)
+
+    def publish(self, event):
+        self.latest = event
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def run(self):
+        city, source, destination = self.key
+        client = f"live:{'|'.join(part for part in self.key if part)}"
+        distance = city_distance(city) if source is None else None
+        while True:
+            try:
+                # Feeds share the rate limits and prediction slots of the web endpoints
+                deadline = Deadline(get_budget_setting('DEFAULT'))
+                if source is None:
+                    result = await asyncio.to_thread(admission.admit_city, client, city, distance, deadline)
+                else:
+                    result = await asyncio.to_thread(admission.admit, client, city, source, destination, deadline)
+                self.publish(build_event(city, source, destination, result))
+            except admission.RateLimited as e:
+                print(f"Live congestion skipped for {self.key}: {e.reason}")
+            except Exception as e:
+                print(f"Live congestion error for {self.key}: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# (city, source, destination) -> LiveFeed, for the running event loop
+feeds = {}
+
+
+class TooManyFeeds(Exception):
+    pass
+
+
+def feed_available(city, source, destination):
+    """Whether a stream for this city/route can start: its feed runs already or there is room for one"""
+    return (city, source, destination) in feeds or len(feeds) < MAX_FEEDS
+
+
+def get_feed(city, source, destination):
+    key = (city, source, destination)
+    if key not in feeds:
+        if len(feeds) >= MAX_FEEDS:
+            raise TooManyFeeds(f'{MAX_FEEDS} live feeds are already running')
+        feeds[key] = LiveFeed(key)
+    return feeds[key]
+
+
+def city_distance(city):
+    """Typical trip length in a city: the mean distance from its heatmap grid cells to the centre"""
+    distances = tiles.cell_distances(city)
+    return sum(distances) / len(distances)
+
+
+def build_event(city, source, destination, result):
+    """Compact JSON payload for one congestion update"""
+    if source is None:
+        data = serialize_prediction(result, CITY_FIELDS)
+    else:
+        data = serialize_prediction(result, LIVE_FIELDS)
+        data.update({'source': source, 'destination': destination})
+    data.update({
+        'city': city,
+        'updated_at': timezone.now().isoformat(),
+    })
+    return json.dumps(data, separators=(',', ':'), cls=PredictionJSONEncoder)
+
+
+async def event_stream(city, source, destination):
+    """Server-sent events for one city/route until the client disconnects; no source or destination for the whole city"""
+    try:
+        feed = get_feed(city, source, destination)
+    except TooManyFeeds:
+        # Filled up since the view checked; the client reconnects after the retry delay
+        yield f'retry: {LIVE_INTERVAL * 1000}\n\n'
+        return
+    queue = feed.subscribe()
+    try:
+        yield f'retry: {KEEPALIVE_INTERVAL * 1000}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f'event: congestion\ndata: {event}\n\n'
+    finally:
+        feed.unsubscribe(queue)
@@ -1,20 +1,43 @@
+import hashlib
 import pickle
 import os
 import random
+import time
 from datetime import datetime, timedelta
+import threading
 import holidays
 from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 import requests
 import json
 
+from . import shadow
+from .deadline import Deadline, get_setting as get_budget_setting
+
+
+# Fallback coordinates for major cities
+CITY_COORDS = {
+    'Delhi': (28.7041, 77.1025),
+    'Mumbai': (19.0760, 72.8777),
+    'Bengaluru': (12.9716, 77.5946),
+    'Hyderabad': (17.3850, 78.4867),
+    'Chennai': (13.0827, 80.2707),
+    'Kolkata': (22.5726, 88.3639),
+}
+
 
 class TrafficPredictor:
     def __init__(self):
         self.model = None
+        self.model_version = 'fallback'
         self.geolocator = Nominatim(user_agent="traffic_predictor")
         self.india_holidays = holidays.India()
+        # Successful geocodes, reused by the degraded prediction path
+        self.geocode_cache = {}
+        self.geocode_cache_lock = threading.Lock()
         self.load_model()
+        # Candidate models scored in the background (settings.SHADOW_MODELS)
+        self.shadow = shadow.from_settings(self.model_version)
     
     def load_model(self):
         """Load the trained model from pickle file"""
@@ -23,35 +46,66 @@ class TrafficPredictor:
         if os.path.exists(model_path):
             try:
                 with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                    data = f.read()
+                self.model = pickle.loads(data)
+                # Identifies the model in precomputed artifacts such as heatmap tiles
+                self.model_version = hashlib.sha1(data).hexdigest()[:12]
                 print("Model loaded successfully")
             except Exception as e:
                 print(f"Error loading model: {e}")
                 self.model = None
+                self.model_version = 'fallback'
         else:
             print("Model file not found, using fallback prediction")
             self.model = None
+            self.model_version = 'fallback'
     
-    def get_coordinates(self, location):
+    def get_coordinates(self, location, timeout=None):
         """Get coordinates for a location using Nominatim API"""
+        coords = self.geocode(location, timeout)
+        if coords:
+            return coords
+        
+        return self.get_coordinates_offline(location)
+    
+    def geocode(self, location, timeout=None):
+        """Nominatim coordinates for a location, or None; `timeout` None keeps geopy's default"""
         try:
-            location_data = self.geolocator.geocode(f"{location}, India")
+            kwargs = {} if timeout is None else {'timeout': timeout}
+            location_data = self.geolocator.geocode(f"{location}, India", **kwargs)
             if location_data:
-                return location_data.latitude, location_data.longitude
+                coords = (location_data.latitude, location_data.longitude)
+                with self.geocode_cache_lock:
+                    if len(self.geocode_cache) >= 10000:
+                        self.geocode_cache.clear()
+                    self.geocode_cache[location.strip().lower()] = coords
+                return coords
         except Exception as e:
             print(f"Error getting coordinates: {e}")
         
-        # Fallback coordinates for major cities
-        city_coords = {
-            'Delhi': (28.7041, 77.1025),
-            'Mumbai': (19.0760, 72.8777),
-            'Bengaluru': (12.9716, 77.5946),
-            'Hyderabad': (17.3850, 78.4867),
-            'Chennai': (13.0827, 80.2707),
-            'Kolkata': (22.5726, 88.3639),
-        }
+        return None
+    
+    def stored_coordinates(self, location):
+        """Coordinates of a previously geocoded Location, or None"""
+        from ..models import Location
         
-        for city, coords in city_coords.items():
+        return (Location.objects.filter(name=location.strip(), geocoded=True)
+                .values_list('latitude', 'longitude').first())
+    
+    def cached_coordinates(self, location):
+        """Coordinates from a previous geocode in this process or the Location table, or None"""
+        return self.geocode_cache.get(location.strip().lower()) or self.stored_coordinates(location)
+    
+    def get_cached_coordinates(self, location, city):
+        """Coordinates without a geocoding call: a previous geocode, else the city centre"""
+        coords = self.cached_coordinates(location)
+        if coords:
+            return coords
+        return CITY_COORDS.get(city) or self.get_coordinates_offline(location)
+    
+    def get_coordinates_offline(self, location):
+        """Fallback coordinates for a location from the major city table"""
+        for city, coords in CITY_COORDS.items():
             if city.lower() in location.lower():
                 return coords
         
@@ -62,13 +116,17 @@ class TrafficPredictor:
         """Calculate distance between two points using Haversine formula"""
         return geodesic((lat1, lon1), (lat2, lon2)).kilometers
     
-    def get_weather_data(self, city):
+    def get_weather_data(self, city, timeout=5):
         """Get weather data from OpenWeather API or generate synthetic data"""
+        return self.fetch_weather(city, timeout) or self.get_synthetic_weather()
+    
+    def fetch_weather(self, city, timeout=5):
+        """Current weather from the OpenWeather API, or None"""
         try:
             # You can add your OpenWeather API key here
             api_key = "your_openweather_api_key"  # Replace with actual key
             url = f"http://api.openweathermap.org/data/2.5/weather?q={city},IN&appid={api_key}&units=metric"
-            response = requests.get(url, timeout=5)
+            response = requests.get(url, timeout=timeout)
             
             if response.status_code == 200:
                 data = response.json()
@@ -76,7 +134,10 @@ class TrafficPredictor:
         except Exception as e:
             print(f"Weather API error: {e}")
         
-        # Fallback: synthetic weather based on time and season
+        return None
+    
+    def get_synthetic_weather(self):
+        """Synthetic weather based on time and season"""
         weather_conditions = ['Clear', 'Clouds', 'Rain', 'Thunderstorm']
         weights = [0.4, 0.3, 0.2, 0.1]
         return random.choices(weather_conditions, weights=weights)[0]
@@ -90,6 +151,15 @@ class TrafficPredictor:
         else:
             return 'highway'
     
+    def get_day_type(self, when):
+        """Classify a date as holiday, weekend or weekday"""
+        if when.date() in self.india_holidays:
+            return 'holiday'
+        elif when.weekday() in [5, 6]:
+            return 'weekend'
+        else:
+            return 'weekday'
+    
     def get_event_flag(self, hour, weekday):
         """Simulate event flag based on time and day"""
         # Higher probability during peak hours and weekends
@@ -108,28 +178,55 @@ class TrafficPredictor:
         if self.model:
             try:
                 # Ensure features match the expected format
-                feature_names = ["city", "distance_km", "hour", "weekday", "day_type", "weather", "event", "route_type"]
-                feature_values = [
-                    features['city'],
-                    features['distance_km'],
-                    features['hour'],
-                    features['weekday'],
-                    features['day_type'],
-                    features['weather'],
-                    features['event'],
-                    features['route_type']
-                ]
+                feature_values = self._feature_values(features)
                 
                 # Make prediction
+                started = time.perf_counter()
                 prediction = self.model.predict([feature_values])[0]
                 probabilities = self.model.predict_proba([feature_values])[0]
-                
-                return prediction, probabilities
             except Exception as e:
                 print(f"Model prediction error: {e}")
+            else:
+                self._submit_shadow(features, prediction, probabilities,
+                                    getattr(self.model, 'classes_', shadow.DEFAULT_CLASSES), started)
+                return prediction, probabilities
         
         # Fallback prediction logic
-        return self._fallback_prediction(features)
+        started = time.perf_counter()
+        prediction, probabilities = self._fallback_prediction(features)
+        self._submit_shadow(features, prediction, probabilities, shadow.DEFAULT_CLASSES, started)
+        return prediction, probabilities
+    
+    def _submit_shadow(self, features, prediction, probabilities, classes, started):
+        """Hand a live prediction to the shadow evaluator; never waits on candidate models or fails the request"""
+        if self.shadow is None:
+            return
+        try:
+            self.shadow.submit(self._feature_values(features), prediction, probabilities, classes,
+                               time.perf_counter() - started)
+        except Exception as e:
+            print(f"Shadow submit error: {e}")
+    
+    def predict_congestion_batch(self, features_list):
+        """Predict many feature dicts with one model call; same results as predict_congestion"""
+        if not features_list:
+            return []
+        
+        if self.model:
+            try:
+                rows = [self._feature_values(features) for features in features_list]
+                predictions = self.model.predict(rows)
+                probabilities = self.model.predict_proba(rows)
+                return list(zip(predictions, probabilities))
+            except Exception as e:
+                print(f"Model batch prediction error: {e}")
+        
+        return [self._fallback_prediction(features) for features in features_list]
+    
+    def _feature_values(self, features):
+        """Order a feature dict the way the model was trained"""
+        feature_names = ["city", "distance_km", "hour", "weekday", "day_type", "weather", "event", "route_type"]
+        return [features[name] for name in feature_names]
     
     def _fallback_prediction(self, features):
         """Fallback prediction logic when model is not available"""
@@ -199,14 +296,122 @@ class TrafficPredictor:
             else:
                 return 'Car'
     
-    def predict_traffic(self, city, source, destination):
-        """Main prediction method"""
+    def predict_traffic(self, city, source, destination, deadline=None):
+        """
+        Main prediction method.
+        
+        With a Deadline, geocoding and weather get the time left (less a small
+        reserve for inference) and switch to cached coordinates, synthetic
+        weather or the fallback model once it runs out. A geocode that fails
+        in time uses the offline coordinates instead. Stages that used an
+        alternative are listed in result['degraded_stages'], and
+        result['geocoded'] tells which endpoints have real coordinates.
+        """
+        deadline = deadline or Deadline()
+        reserve = get_budget_setting('INFERENCE_RESERVE')
+        degraded_stages = []
+        
         # Get coordinates
-        source_lat, source_lon = self.get_coordinates(source)
-        dest_lat, dest_lon = self.get_coordinates(destination)
+        source_coords, source_geocoded = self._coordinates_within(source, city, deadline, reserve)
+        dest_coords, dest_geocoded = self._coordinates_within(destination, city, deadline, reserve)
+        if not (source_geocoded and dest_geocoded):
+            degraded_stages.append('geocode')
         
-        # Calculate distance
-        distance = self.calculate_distance(source_lat, source_lon, dest_lat, dest_lon)
+        result = self._predict_within(city, source_coords, dest_coords, deadline, degraded_stages)
+        result['geocoded'] = {'source': source_geocoded, 'destination': dest_geocoded}
+        return result
+    
+    def predict_city(self, city, distance, deadline=None):
+        """
+        City-wide congestion, scored as a trip of `distance` km through the city.
+        
+        Nothing is geocoded; weather and inference follow the deadline as in
+        predict_traffic.
+        """
+        centre = CITY_COORDS.get(city) or self.get_coordinates_offline(city)
+        return self._predict_within(city, centre, centre, deadline or Deadline(), [], distance)
+    
+    def predict_city_degraded(self, city, distance):
+        """predict_city without upstream calls or model inference, used when shedding load"""
+        centre = CITY_COORDS.get(city) or self.get_coordinates_offline(city)
+        weather = self.get_synthetic_weather()
+        
+        result = self._predict_route(city, centre, centre, weather, self._fallback_prediction, distance)
+        result['degraded'] = True
+        result['degraded_stages'] = ['weather', 'inference']
+        return result
+    
+    def _predict_within(self, city, source_coords, dest_coords, deadline, degraded_stages, distance=None):
+        """Weather and inference within the deadline, else synthetic weather and the fallback model"""
+        reserve = get_budget_setting('INFERENCE_RESERVE')
+        
+        # Get weather
+        weather = None
+        if not deadline.expired(reserve):
+            weather = self.fetch_weather(city, deadline.timeout(5, reserve))
+        if weather is None:
+            degraded_stages.append('weather')
+            weather = self.get_synthetic_weather()
+        
+        def predict_fn(features):
+            if deadline.expired():
+                degraded_stages.append('inference')
+                return self._fallback_prediction(features)
+            return self.predict_congestion(features)
+        
+        result = self._predict_route(city, source_coords, dest_coords, weather, predict_fn, distance)
+        result['degraded_stages'] = degraded_stages
+        return result
+    
+    def _coordinates_within(self, location, city, deadline, reserve):
+        """
+        (coordinates, geocoded) for a location, geocoding within the deadline.
+
+        Locations geocoded before are read from the database without calling
+        Nominatim. Out of time it falls back to cached coordinates; a lookup
+        that failed in time falls back to the offline city table.
+        """
+        coords = self.stored_coordinates(location)
+        if coords:
+            return coords, True
+        if not deadline.expired(reserve):
+            coords = self.geocode(location, deadline.timeout(reserve=reserve))
+            if coords:
+                return coords, True
+            if not deadline.expired(reserve):
+                return self.get_coordinates_offline(location), False
+        return self.get_cached_coordinates(location, city), False
+    
+    def predict_traffic_degraded(self, city, source, destination):
+        """
+        Prediction without upstream calls or model inference, used when shedding load.
+        
+        Returns None unless both endpoints were geocoded before: guessed
+        coordinates would put the whole trip at the city centre. The distance
+        and suggested mode are left out of the result.
+        """
+        source_coords = self.cached_coordinates(source)
+        dest_coords = self.cached_coordinates(destination)
+        if source_coords is None or dest_coords is None:
+            return None
+        weather = self.get_synthetic_weather()
+        
+        result = self._predict_route(city, source_coords, dest_coords, weather, self._fallback_prediction)
+        result['features']['distance_km'] = None
+        result['suggested_mode'] = None
+        result['degraded'] = True
+        result['degraded_stages'] = ['geocode', 'weather', 'inference']
+        result['geocoded'] = {'source': False, 'destination': False}
+        return result
+    
+    def _predict_route(self, city, source_coords, dest_coords, weather, predict_fn, distance=None):
+        """Build features for a route at the current time and run `predict_fn` on them"""
+        source_lat, source_lon = source_coords
+        dest_lat, dest_lon = dest_coords
+        
+        # Calculate distance, unless the caller scores a representative trip
+        if distance is None:
+            distance = self.calculate_distance(source_lat, source_lon, dest_lat, dest_lon)
         
         # Get current time
         now = datetime.now()
@@ -214,15 +419,7 @@ class TrafficPredictor:
         weekday = now.weekday()
         
         # Determine day type
-        if now.date() in self.india_holidays:
-            day_type = 'holiday'
-        elif weekday in [5, 6]:
-            day_type = 'weekend'
-        else:
-            day_type = 'weekday'
-        
-        # Get weather
-        weather = self.get_weather_data(city)
+        day_type = self.get_day_type(now)
         
         # Get event flag
         event_flag = self.get_event_flag(hour, weekday)
@@ -243,7 +440,7 @@ class TrafficPredictor:
         }
         
         # Make prediction
-        congestion_level, probabilities = self.predict_congestion(features)
+        congestion_level, probabilities = predict_fn(features)
         
         # Suggest mode
         suggested_mode = self.suggest_mode(congestion_level, distance)
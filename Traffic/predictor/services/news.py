@@ -0,0 +1,194 @@
+import random
+from datetime import datetime, timedelta
+
+import requests
+from django.db import connection
+from django.db.models import Count, Max, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import NewsArticle
+from ..pagination import keyset_page
+
+
+# Articles requested from NewsAPI per city and fetch
+FETCH_LIMIT = 50
+PAGE_SIZE = 12
+
+# External-content FTS5 table kept in sync by triggers (migration 0007)
+FTS_TABLE = 'predictor_newsarticle_fts'
+
+
+def ingest_news(city):
+    """
+    Fetch a city's news and store the articles not seen before.
+
+    Articles are deduplicated by URL, both within the fetch and against the
+    table. When NewsAPI is unavailable, a city with nothing stored gets
+    synthetic placeholder articles; the first real fetch deletes them.
+    Cached news pages follow stored_version(), so they change with the rows.
+    Returns the number of new articles.
+    """
+    try:
+        items = fetch_news_articles(city)
+        synthetic = False
+    except Exception as e:
+        print(f"News API error: {e}")
+        if NewsArticle.objects.filter(city=city).exists():
+            return 0
+        items = generate_synthetic_news(city)
+        synthetic = True
+    
+    articles = {}
+    for item in items:
+        url = (item.get('url') or '').strip()[:500]
+        if not url.startswith(('http://', 'https://', NewsArticle.SYNTHETIC_PREFIX)):
+            continue
+        if not item.get('title') or url in articles:
+            continue
+        articles[url] = NewsArticle(
+            city=city,
+            url=url,
+            title=item['title'][:300],
+            description=item.get('description') or '',
+            content=item.get('content') or '',
+            source_name=((item.get('source') or {}).get('name') or '')[:200],
+            published_at=parse_published(item.get('publishedAt')),
+        )
+
+    existing = set(NewsArticle.objects.filter(url__in=list(articles)).values_list('url', flat=True))
+    new = [article for url, article in articles.items() if url not in existing]
+    # ignore_conflicts covers another fetcher storing the same URL in the meantime
+    NewsArticle.objects.bulk_create(new, ignore_conflicts=True)
+    if articles and not synthetic:
+        NewsArticle.objects.filter(city=city, url__startswith=NewsArticle.SYNTHETIC_PREFIX).delete()
+    return len(new)
+
+
+def stored_version(city):
+    """
+    Fingerprint of a city's stored articles, for cache keys.
+
+    The fetcher runs in its own process, where invalidating the web workers'
+    cache has no effect; this changes whenever it adds or removes articles.
+    """
+    stored = NewsArticle.objects.filter(city=city).aggregate(newest=Max('id'), count=Count('id'))
+    return f"{stored['newest'] or 0}-{stored['count']}"
+
+
+def parse_published(value):
+    """Aware datetime for a NewsAPI publishedAt value; now when missing or malformed"""
+    published = parse_datetime(value) if value else None
+    if published is None:
+        return timezone.now()
+    if timezone.is_naive(published):
+        published = timezone.make_aware(published)
+    return published
+
+
+def fts_query(text):
+    """FTS5 MATCH expression for user input: every word must match, as a prefix"""
+    words = text.split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def search_articles(queryset, text):
+    """Filter articles to those matching `text`, using the FTS5 index on SQLite"""
+    if connection.vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [fts_query(text)]
+        ))
+    query = Q()
+    for word in text.split():
+        query &= Q(title__icontains=word) | Q(description__icontains=word) | Q(content__icontains=word)
+    return queryset.filter(query)
+
+
+def articles_page(city=None, text='', cursor=None, per_page=PAGE_SIZE):
+    """
+    One page of stored articles, newest first, and the cursor for the next page.
+
+    Listing uses the (city, published_at, id) index and keyset pagination;
+    searching goes through the full-text index.
+    """
+    queryset = NewsArticle.objects.order_by('-published_at', '-id')
+    if city:
+        queryset = queryset.filter(city=city)
+    if text.strip():
+        queryset = search_articles(queryset, text)
+    return keyset_page(queryset, cursor, per_page, field='published_at')
+
+
+def fetch_news_articles(selected_city):
+    """Fetch news from NewsAPI; raises when the request fails"""
+    # You can add your NewsAPI key here
+    api_key = "your_newsapi_key"  # Replace with actual key
+    query = f"traffic {selected_city}"
+    url = f"https://newsapi.org/v2/everything?q={query}&language=en&sortBy=publishedAt&apiKey={api_key}"
+    
+    response = requests.get(url, timeout=10)
+    if response.status_code != 200:
+        raise Exception("API request failed")
+    data = response.json()
+    return data.get('articles', [])[:FETCH_LIMIT]
+
+
+def generate_synthetic_news(city):
+    """Generate synthetic traffic news when API is unavailable"""
+    headlines_and_content = [
+        {
+            'title': f"Traffic congestion expected on major roads in {city} during peak hours",
+            'content': f"Commuters in {city} are advised to plan their journeys carefully as traffic congestion is expected on major arterial roads during peak hours today. The traffic police have identified several bottlenecks including main intersections and highway entry points. Alternative routes are recommended for faster travel."
+        },
+        {
+            'title': f"New metro line to reduce traffic in {city} by 30%",
+            'content': f"The newly inaugurated metro line in {city} is expected to significantly reduce road traffic by up to 30% according to transport authorities. The line connects major commercial and residential areas, providing commuters with a faster and more reliable alternative to road transport."
+        },
+        {
+            'title': f"Smart traffic signals installed across {city} to improve flow",
+            'content': f"The {city} municipal corporation has installed AI-powered smart traffic signals at 50 major intersections. These signals adapt to real-time traffic conditions and are expected to reduce waiting times by 25% and improve overall traffic flow throughout the city."
+        },
+        {
+            'title': f"Construction work on {city} highways may cause delays",
+            'content': f"Ongoing construction work on major highways in {city} may cause significant delays for commuters over the next two weeks. The public works department advises using alternative routes and allowing extra travel time. Work is being conducted during off-peak hours where possible."
+        },
+        {
+            'title': f"Traffic police launch new initiative to reduce congestion in {city}",
+            'content': f"The {city} traffic police have launched a comprehensive initiative to tackle traffic congestion. The program includes deployment of additional personnel at key intersections, improved signal timing, and a public awareness campaign about traffic rules and safe driving practices."
+        },
+        {
+            'title': f"Public transport usage increases in {city} as fuel prices rise",
+            'content': f"With rising fuel prices, more commuters in {city} are switching to public transport. Bus ridership has increased by 15% over the past month, while metro usage has grown by 20%. Transport authorities are considering increasing service frequency to meet growing demand."
+        },
+        {
+            'title': f"New flyover project to ease traffic in {city} city center",
+            'content': f"A new flyover project in {city} city center is set to begin next month. The project aims to reduce traffic congestion at one of the busiest intersections in the city. The flyover is expected to be completed within 18 months and will significantly improve traffic flow."
+        },
+        {
+            'title': f"Traffic advisory issued for {city} due to upcoming festival",
+            'content': f"The {city} traffic police have issued an advisory for the upcoming festival celebrations. Several roads will be closed or have restricted access. Commuters are advised to use public transport and avoid the city center during festival hours. Additional parking arrangements have been made."
+        },
+        {
+            'title': f"Bike lanes to be expanded across {city} to promote cycling",
+            'content': f"The {city} municipal corporation has announced plans to expand dedicated bike lanes across the city. The initiative aims to promote cycling as an eco-friendly mode of transport and reduce vehicular traffic. The project will cover 100 kilometers of roads over the next year."
+        },
+        {
+            'title': f"Traffic monitoring system upgraded in {city} with AI technology",
+            'content': f"The traffic monitoring system in {city} has been upgraded with artificial intelligence technology. The new system can predict traffic patterns, detect accidents in real-time, and automatically adjust signal timings. This is expected to reduce travel time by up to 20%."
+        }
+    ]
+    
+    sources = ['Times of India', 'Hindustan Times', 'The Hindu', 'Economic Times', 'Indian Express']
+    
+    news_articles = []
+    for i, article_data in enumerate(headlines_and_content):
+        news_articles.append({
+            'title': article_data['title'],
+            'content': article_data['content'],
+            'source': {'name': random.choice(sources)},
+            'url': f"{NewsArticle.SYNTHETIC_PREFIX}{city}/{i+1}",
+            'publishedAt': (datetime.now() - timedelta(days=random.randint(1, 7))).isoformat()
+        })
+    
+    return news_articles
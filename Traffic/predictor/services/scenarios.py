@@ -0,0 +1,159 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from ..models import SavedScenario, ScenarioForecast
+from ..serializers import SCHEMA_VERSION, serialize_rows
+from .model import predictor
+
+
+# Number of upcoming hours forecast for each saved scenario
+FORECAST_HOURS = 6
+
+
+def upcoming_hours(start, hours=FORECAST_HOURS):
+    """Top-of-hour timestamps for the next `hours` hours, starting with the current one"""
+    start = start.replace(minute=0, second=0, microsecond=0)
+    return [start + timedelta(hours=i) for i in range(hours)]
+
+
+def precompute_forecasts(scenarios=None, hours=FORECAST_HOURS, regeocode=False):
+    """
+    Precompute hourly predictions for saved scenarios.
+
+    Coordinates are geocoded once per scenario and reused on later runs
+    (`regeocode` refreshes them), weather is fetched once per city, and all
+    scenario/hour combinations are scored with a single batched model call.
+    Scenarios whose route cannot be geocoded are skipped and retried on the
+    next run rather than stored with fallback coordinates. Returns the number
+    of forecasts written.
+    """
+    if scenarios is None:
+        scenarios = SavedScenario.objects.all()
+    scenarios = list(scenarios.select_related('forecast'))
+    if not scenarios:
+        return 0
+
+    now = timezone.now()
+    slots = upcoming_hours(timezone.localtime(now), hours)
+    weather_by_city = {}
+    routes = []
+    features_list = []
+
+    for scenario in scenarios:
+        forecast = scenario.forecast if _has_forecast(scenario) else None
+        if (forecast and not regeocode
+                and (forecast.source, forecast.destination) == (scenario.source, scenario.destination)):
+            coords = (forecast.source_lat, forecast.source_lon, forecast.dest_lat, forecast.dest_lon)
+        else:
+            coords = geocode_route(scenario.source, scenario.destination)
+            if coords is None:
+                if forecast and scenario.current_forecast is None:
+                    # Made for the route before an edit; never show it under the new one
+                    forecast.delete()
+                print(f"Skipping scenario {scenario.id}: could not geocode {scenario.source} -> {scenario.destination}")
+                continue
+
+        if scenario.city not in weather_by_city:
+            weather_by_city[scenario.city] = predictor.get_weather_data(scenario.city)
+
+        distance = predictor.calculate_distance(*coords)
+        route_type = predictor.get_route_type(distance)
+        routes.append((scenario, coords, distance, route_type))
+
+        for slot in slots:
+            features_list.append({
+                'city': scenario.city,
+                'distance_km': distance,
+                'hour': slot.hour,
+                'weekday': slot.weekday(),
+                'day_type': predictor.get_day_type(slot),
+                'weather': weather_by_city[scenario.city],
+                'event': predictor.get_event_flag(slot.hour, slot.weekday()),
+                'route_type': route_type,
+            })
+
+    results = iter(predictor.predict_congestion_batch(features_list))
+
+    for scenario, coords, distance, route_type in routes:
+        hourly = []
+        for slot in slots:
+            congestion_level, probabilities = next(results)
+            congestion_level = str(congestion_level)
+            hourly.append({
+                'time': slot.astimezone(dt_timezone.utc).isoformat(),
+                'hour': slot.hour,
+                'congestion_level': congestion_level,
+                'suggested_mode': predictor.suggest_mode(congestion_level, distance),
+                'probabilities': [float(p) for p in probabilities],
+            })
+
+        ScenarioForecast.objects.update_or_create(
+            scenario=scenario,
+            defaults={
+                'source': scenario.source,
+                'destination': scenario.destination,
+                'source_lat': coords[0],
+                'source_lon': coords[1],
+                'dest_lat': coords[2],
+                'dest_lon': coords[3],
+                'distance_km': distance,
+                'route_type': route_type,
+                'weather': weather_by_city[scenario.city],
+                'hourly': hourly,
+                'computed_at': now,
+            },
+        )
+
+    return len(routes)
+
+
+def geocode_route(source, destination):
+    """(source_lat, source_lon, dest_lat, dest_lon) of stored or Nominatim geocodes, or None when either fails"""
+    source_coords = predictor.stored_coordinates(source) or predictor.geocode(source)
+    if source_coords is None:
+        return None
+    dest_coords = predictor.stored_coordinates(destination) or predictor.geocode(destination)
+    if dest_coords is None:
+        return None
+    return tuple(source_coords) + tuple(dest_coords)
+
+
+def _has_forecast(scenario):
+    try:
+        scenario.forecast
+    except ScenarioForecast.DoesNotExist:
+        return False
+    return True
+
+
+HOURLY_COLUMNS = ('time', 'hour', 'congestion_level', 'suggested_mode', 'probabilities')
+
+
+def serialize_forecast(scenario, compact=False):
+    """
+    JSON-ready view of a scenario and its latest forecast, with staleness metadata.
+
+    With `compact` the hourly entries are sent as column-oriented arrays.
+    """
+    data = {
+        'version': SCHEMA_VERSION,
+        'id': scenario.id,
+        'name': scenario.name,
+        'city': scenario.city,
+        'source': scenario.source,
+        'destination': scenario.destination,
+        'forecast': None,
+    }
+    forecast = scenario.current_forecast
+    if forecast:
+        data['forecast'] = {
+            'computed_at': forecast.computed_at.isoformat(),
+            'age_seconds': forecast.age_seconds,
+            'stale': forecast.is_stale,
+            'distance_km': forecast.distance_km,
+            'route_type': forecast.route_type,
+            'weather': forecast.weather,
+            'hourly': serialize_rows(forecast.upcoming(), HOURLY_COLUMNS) if compact else forecast.upcoming(),
+        }
+    return data
@@ -0,0 +1,261 @@
+import hashlib
+import os
+import pickle
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+
+DEFAULTS = {
+    'WORKERS': 1,           # background scoring threads, per process
+    'QUEUE_SIZE': 1000,     # pending samples; new samples are dropped when full
+    'BATCH_SIZE': 64,       # samples per candidate model call
+    'BATCH_WAIT': 0.5,      # seconds to wait for a batch to fill
+    'FLUSH_INTERVAL': 60,   # seconds of statistics per ShadowEvaluation row
+}
+
+# Class order of the fallback probabilities, used when a model has no classes_
+DEFAULT_CLASSES = ('Low', 'Medium', 'High')
+
+
+def get_setting(name):
+    return getattr(settings, 'SHADOW_EVALUATION', {}).get(name, DEFAULTS[name])
+
+
+class Candidate:
+    def __init__(self, name, model, version):
+        self.name = name
+        self.model = model
+        self.version = version
+
+
+def load_candidates(paths):
+    """Unpickle the candidate models listed in settings.SHADOW_MODELS (name -> path)"""
+    candidates = []
+    for name, path in paths.items():
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            candidates.append(Candidate(name, pickle.loads(data), hashlib.sha1(data).hexdigest()[:12]))
+        except Exception as e:
+            print(f"Error loading shadow model {name}: {e}")
+    return candidates
+
+
+def probability_delta(classes, probabilities, other_classes, other_probabilities):
+    """Mean absolute difference between two class probability vectors, matched by label"""
+    first = {str(label): float(p) for label, p in zip(classes, probabilities)}
+    second = {str(label): float(p) for label, p in zip(other_classes, other_probabilities)}
+    labels = first.keys() | second.keys()
+    if not labels:
+        return 0.0
+    return sum(abs(first.get(label, 0.0) - second.get(label, 0.0)) for label in labels) / len(labels)
+
+
+class WindowStats:
+    """Running totals for one candidate over one flush interval"""
+
+    def __init__(self):
+        self.samples = 0
+        self.agreements = 0
+        self.errors = 0
+        self.batches = 0
+        self.probability_delta = 0.0
+        self.primary_seconds = 0.0
+        self.candidate_seconds = 0.0
+
+    def add(self, other):
+        self.samples += other.samples
+        self.agreements += other.agreements
+        self.errors += other.errors
+        self.batches += other.batches
+        self.probability_delta += other.probability_delta
+        self.primary_seconds += other.primary_seconds
+        self.candidate_seconds += other.candidate_seconds
+
+
+class ShadowEvaluator:
+    """
+    Scores candidate models against live predictions off the request path.
+
+    submit() only enqueues; it never blocks and drops the sample when the
+    queue is full. Worker threads drain the queue in batches, run each
+    candidate once per batch and add the results to one window shared by
+    all workers; whichever worker first sees the window end writes one
+    ShadowEvaluation row per candidate for it.
+    """
+
+    def __init__(self, candidates, primary_version, workers, queue_size, batch_size, batch_wait, flush_interval):
+        self.candidates = candidates
+        self.primary_version = primary_version
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Threads do not survive a fork, so each process starts its own
+        self.pid = os.getpid()
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.threads = []
+        self.dropped = 0
+        self.window = self._new_window()
+        self.window_start = timezone.now()
+        self.next_flush = time.monotonic() + self.flush_interval
+
+    def _new_window(self):
+        return {candidate.name: WindowStats() for candidate in self.candidates}
+
+    def submit(self, feature_values, prediction, probabilities, classes, primary_seconds):
+        """Queue one live prediction for shadow scoring; returns False when it was dropped"""
+        if not self._running():
+            self._start()
+        try:
+            self.queue.put_nowait((feature_values, prediction, probabilities, classes, primary_seconds))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def _running(self):
+        return (self.pid == os.getpid() and len(self.threads) == self.workers
+                and all(thread.is_alive() for thread in self.threads))
+
+    def _start(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            alive = [thread for thread in self.threads if thread.is_alive()]
+            if len(alive) < len(self.threads):
+                print(f"Restarting {len(self.threads) - len(alive)} stopped shadow evaluator thread(s)")
+            self.threads = alive
+            for number in range(len(self.threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f'shadow-evaluator-{number}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _run(self):
+        while True:
+            # A failing batch or flush must not end the thread, or shadowing stops for good
+            try:
+                batch = self._next_batch(max(0.0, self.next_flush - time.monotonic()))
+                if batch:
+                    self._score(batch)
+                self._flush_due()
+            except Exception as e:
+                print(f"Shadow evaluation error: {e}")
+
+    def _next_batch(self, timeout):
+        """Up to batch_size samples: wait `timeout` for the first, then batch_wait for the rest"""
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score(self, batch):
+        """Run every candidate on a batch and add the results to the shared window"""
+        rows = [item[0] for item in batch]
+        scored = self._new_window()
+        for candidate in self.candidates:
+            stats = scored[candidate.name]
+            started = time.perf_counter()
+            try:
+                predictions = candidate.model.predict(rows)
+                probabilities = candidate.model.predict_proba(rows)
+            except Exception as e:
+                print(f"Shadow model {candidate.name} error: {e}")
+                stats.errors += len(batch)
+                continue
+            stats.candidate_seconds += time.perf_counter() - started
+            stats.batches += 1
+
+            candidate_classes = getattr(candidate.model, 'classes_', DEFAULT_CLASSES)
+            for item, prediction, candidate_probabilities in zip(batch, predictions, probabilities):
+                _, primary_prediction, primary_probabilities, classes, primary_seconds = item
+                stats.samples += 1
+                stats.agreements += str(prediction) == str(primary_prediction)
+                stats.probability_delta += probability_delta(
+                    classes, primary_probabilities, candidate_classes, candidate_probabilities)
+                stats.primary_seconds += primary_seconds
+
+        with self.lock:
+            for name, stats in scored.items():
+                self.window[name].add(stats)
+
+    def _flush_due(self):
+        """Start a new window once FLUSH_INTERVAL is up and record the finished one"""
+        with self.lock:
+            if time.monotonic() < self.next_flush:
+                return
+            window, window_start, dropped = self.window, self.window_start, self.dropped
+            window_end = timezone.now()
+            self.window = self._new_window()
+            self.window_start = window_end
+            self.dropped = 0
+            self.next_flush = time.monotonic() + self.flush_interval
+        self._flush(window, window_start, window_end, dropped)
+
+    def _flush(self, window, window_start, window_end, dropped):
+        from ..models import ShadowEvaluation
+
+        if not dropped and not any(stats.samples or stats.errors for stats in window.values()):
+            return
+
+        rows = []
+        for candidate in self.candidates:
+            stats = window[candidate.name]
+            samples = stats.samples or 1
+            rows.append(ShadowEvaluation(
+                candidate=candidate.name,
+                candidate_version=candidate.version,
+                primary_version=self.primary_version,
+                window_start=window_start,
+                window_end=window_end,
+                samples=stats.samples,
+                agreements=stats.agreements,
+                errors=stats.errors,
+                dropped=dropped,
+                batches=stats.batches,
+                probability_delta=stats.probability_delta / samples,
+                primary_ms=stats.primary_seconds * 1000 / samples,
+                candidate_ms=stats.candidate_seconds * 1000 / samples,
+            ))
+        try:
+            close_old_connections()
+            ShadowEvaluation.objects.bulk_create(rows)
+        except Exception as e:
+            print(f"Error recording shadow evaluation: {e}")
+
+
+def from_settings(primary_version):
+    """ShadowEvaluator for settings.SHADOW_MODELS, or None when no candidate is configured"""
+    candidates = load_candidates(getattr(settings, 'SHADOW_MODELS', {}))
+    if not candidates:
+        return None
+    return ShadowEvaluator(
+        candidates,
+        primary_version,
+        workers=get_setting('WORKERS'),
+        queue_size=get_setting('QUEUE_SIZE'),
+        batch_size=get_setting('BATCH_SIZE'),
+        batch_wait=get_setting('BATCH_WAIT'),
+        flush_interval=get_setting('FLUSH_INTERVAL'),
+    )
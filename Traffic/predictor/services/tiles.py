@@ -0,0 +1,234 @@
+import json
+import math
+import os
+import struct
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from .model import predictor
+
+
+TILES_ROOT = getattr(settings, 'HEATMAP_TILES_ROOT', os.path.join(settings.BASE_DIR, 'tiles'))
+
+# Cells per side of each city's grid
+GRID_SIZE = 48
+TILE_SIZE = 256
+MAX_ZOOM = 18
+
+# (south, west, north, east) of the area covered by each city's overlay
+CITY_BOUNDS = {
+    'Delhi': (28.40, 76.84, 28.88, 77.35),
+    'Mumbai': (18.89, 72.77, 19.27, 73.00),
+    'Bengaluru': (12.83, 77.46, 13.14, 77.78),
+    'Hyderabad': (17.24, 78.28, 17.56, 78.65),
+    'Chennai': (12.90, 80.13, 13.23, 80.32),
+    'Kolkata': (22.45, 88.25, 22.67, 88.45),
+}
+
+# Tiles describe a typical working day in clear weather without events
+TYPICAL_CONDITIONS = {'weekday': 2, 'day_type': 'weekday', 'weather': 'Clear', 'event': False}
+
+# Colour ramp for congestion scores 0..1: green, yellow, red
+COLOR_STOPS = np.array([[34, 197, 94], [234, 179, 8], [239, 68, 68]], dtype=np.float32)
+OVERLAY_ALPHA = 150
+
+
+def city_dir(city):
+    return os.path.join(TILES_ROOT, city)
+
+
+def load_meta(city):
+    try:
+        with open(os.path.join(city_dir(city), 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_meta(city, meta):
+    path = os.path.join(city_dir(city), 'meta.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(path + '.tmp', path)
+
+
+def cell_centres(city, grid=GRID_SIZE):
+    """Latitude/longitude of every cell centre, row-major from the north-west corner"""
+    south, west, north, east = CITY_BOUNDS[city]
+    lats = north - (np.arange(grid) + 0.5) * (north - south) / grid
+    lons = west + (np.arange(grid) + 0.5) * (east - west) / grid
+    return [(float(lat), float(lon)) for lat in lats for lon in lons]
+
+
+@lru_cache(maxsize=None)
+def cell_distances(city, grid=GRID_SIZE):
+    """Distance in km from every cell centre to the city centre; shared by all 24 hours"""
+    centre_lat, centre_lon = predictor.get_coordinates_offline(city)
+    return tuple(predictor.calculate_distance(lat, lon, centre_lat, centre_lon)
+                 for lat, lon in cell_centres(city, grid))
+
+
+def congestion_score(probabilities, classes):
+    """Expected congestion in 0..1 from class probabilities (Low 0, Medium 0.5, High 1)"""
+    weights = {'Low': 0.0, 'Medium': 0.5, 'High': 1.0}
+    return sum(float(p) * weights.get(str(label), 0.0) for label, p in zip(classes, probabilities))
+
+
+def score_city_hour(city, hour, grid=GRID_SIZE):
+    """
+    Score every grid cell of a city for one hour with a single batched model call.
+
+    Each cell is treated as a trip from the cell to the city centre. Returns
+    the grid as uint8 bytes (0 = free flowing, 255 = fully congested).
+    """
+    features_list = []
+    for distance in cell_distances(city, grid):
+        features_list.append({
+            'city': city,
+            'distance_km': distance,
+            'hour': hour,
+            'weekday': TYPICAL_CONDITIONS['weekday'],
+            'day_type': TYPICAL_CONDITIONS['day_type'],
+            'weather': TYPICAL_CONDITIONS['weather'],
+            'event': TYPICAL_CONDITIONS['event'],
+            'route_type': predictor.get_route_type(distance),
+        })
+
+    classes = getattr(predictor.model, 'classes_', None)
+    if classes is None:
+        classes = ['Low', 'Medium', 'High']
+
+    scores = [congestion_score(probabilities, classes)
+              for _, probabilities in predictor.predict_congestion_batch(features_list)]
+    return np.clip(np.round(np.array(scores) * 255), 0, 255).astype(np.uint8).tobytes()
+
+
+def stale_hours(city, model_version, force=False):
+    """Hours of a city whose stored grid was built by another model or grid layout"""
+    meta = load_meta(city)
+    if force or not meta or meta.get('grid') != GRID_SIZE or meta.get('bounds') != list(CITY_BOUNDS[city]):
+        return list(range(24))
+    return [hour for hour in range(24) if meta['hours'].get(str(hour)) != model_version]
+
+
+def store_grid(city, hour, data, model_version):
+    """Write one hour's grid and record the model version that produced it"""
+    os.makedirs(city_dir(city), exist_ok=True)
+    path = os.path.join(city_dir(city), f'{hour}.u8')
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+    meta = load_meta(city)
+    if not meta or meta.get('grid') != GRID_SIZE or meta.get('bounds') != list(CITY_BOUNDS[city]):
+        meta = {'grid': GRID_SIZE, 'bounds': list(CITY_BOUNDS[city]), 'hours': {}}
+    meta['hours'][str(hour)] = model_version
+    save_meta(city, meta)
+
+
+_grid_cache = {}
+
+
+def load_grid(city, hour):
+    """(version, grid array) for a city/hour, or None when it has not been built"""
+    meta = load_meta(city)
+    if not meta or str(hour) not in meta['hours']:
+        return None
+    version = meta['hours'][str(hour)]
+    key = (city, hour, version)
+    if key not in _grid_cache:
+        try:
+            with open(os.path.join(city_dir(city), f'{hour}.u8'), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(_grid_cache) > 24 * len(CITY_BOUNDS):
+            _grid_cache.clear()
+        _grid_cache[key] = np.frombuffer(data, dtype=np.uint8).reshape(meta['grid'], meta['grid'])
+    return version, _grid_cache[key]
+
+
+def tile_url_template(city, hour):
+    """Leaflet URL template for a city/hour overlay, or None when no tiles are built"""
+    loaded = load_grid(city, hour)
+    if loaded is None:
+        return None
+    return f'/tiles/{city}/{hour}/{{z}}/{{x}}/{{y}}?v={loaded[0]}'
+
+
+def render_tile(city, grid, z, x, y):
+    """Render one 256x256 Web Mercator tile of a city grid as RGBA PNG bytes"""
+    if not tile_in_bounds(city, z, x, y):
+        return empty_tile()
+
+    south, west, north, east = CITY_BOUNDS[city]
+    size = grid.shape[0]
+    n = 2 ** z
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+
+    rows = np.floor((north - lats) / (north - south) * size).astype(int)
+    cols = np.floor((lons - west) / (east - west) * size).astype(int)
+    row_ok = (rows >= 0) & (rows < size)
+    col_ok = (cols >= 0) & (cols < size)
+
+    rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    if row_ok.any() and col_ok.any():
+        scores = grid[np.clip(rows, 0, size - 1)][:, np.clip(cols, 0, size - 1)].astype(np.float32) / 255
+        # Piecewise-linear ramp between the colour stops
+        position = scores * (len(COLOR_STOPS) - 1)
+        low = np.minimum(position.astype(int), len(COLOR_STOPS) - 2)
+        fraction = (position - low)[..., None]
+        colours = COLOR_STOPS[low] * (1 - fraction) + COLOR_STOPS[low + 1] * fraction
+        mask = row_ok[:, None] & col_ok[None, :]
+        rgba[..., :3] = colours.astype(np.uint8)
+        rgba[..., 3] = np.where(mask, OVERLAY_ALPHA, 0)
+    return encode_png(rgba)
+
+
+def empty_tile():
+    global _empty_tile
+    if _empty_tile is None:
+        _empty_tile = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+    return _empty_tile
+
+
+_empty_tile = None
+
+
+def encode_png(rgba):
+    """Minimal RGBA PNG encoder, so tile rendering needs no imaging library"""
+    height, width = rgba.shape[:2]
+    raw = b''.join(b'\x00' + rgba[row].tobytes() for row in range(height))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(raw, 6))
+        + chunk(b'IEND', b'')
+    )
+
+
+def valid_tile(z, x, y):
+    """Whether z/x/y names an existing Web Mercator tile at a zoom up to MAX_ZOOM"""
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_in_bounds(city, z, x, y):
+    """Whether a Web Mercator tile overlaps a city's bounding box"""
+    if not valid_tile(z, x, y):
+        return False
+    south, west, north, east = CITY_BOUNDS[city]
+    n = 2 ** z
+    tile_west = x / n * 360.0 - 180.0
+    tile_east = (x + 1) / n * 360.0 - 180.0
+    tile_north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    tile_south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return tile_west < east and tile_east > west and tile_south < north and tile_north > south
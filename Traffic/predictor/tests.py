@@ -1,3 +1,980 @@
-from django.test import TestCase
+import asyncio
+import math
+import sqlite3
+import tempfile
+import time
+from contextlib import aclosing
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .caching import cache_version, invalidate, invalidate_news
+from .db import PIN_COOKIE, ReadReplicaMiddleware, ReadReplicaRouter, apply_sqlite_pragmas, replica_reads
+from .models import Location, NewsArticle, Prediction, SavedScenario, ScenarioForecast, ShadowEvaluation
+from .pagination import EstimatedCountPaginator, decode_cursor, encode_cursor, keyset_page
+from .serializers import (
+    DEFAULT_FIELDS, SCHEMA_VERSION, InvalidFields, api_response, parse_fields, serialize_prediction, serialize_rows,
+)
+from .services import admission, live, news, shadow, tiles
+from .services.deadline import Deadline, InvalidBudget, deadline_from_request
+from .services.model import CITY_COORDS, predictor
+from .services.scenarios import HOURLY_COLUMNS, precompute_forecasts, serialize_forecast, upcoming_hours
+
+
+def make_prediction(**kwargs):
+    """A saved Prediction with sensible defaults for every field"""
+    values = {
+        'city': 'Delhi',
+        'source': Location.remember('Saket', (28.52, 77.21)),
+        'destination': Location.remember('Noida', (28.53, 77.39)),
+        'distance_km': 17.0,
+        'hour': 9,
+        'weekday': 1,
+        'day_type': 'weekday',
+        'weather': 'Clear',
+        'route_type': 'highway',
+        'congestion_level': 'High',
+        'suggested_mode': 'Metro',
+    }
+    values.update(kwargs)
+    return Prediction.objects.create(**values)
+
+
+class KeysetPaginationTests(TestCase):
+    def test_cursor_round_trip(self):
+        when = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(when, 42)), (when, 42))
+
+    def test_malformed_cursor_is_ignored(self):
+        for token in (None, '', 'not-a-cursor', '!!!', encode_cursor(timezone.now(), 1)[:-3]):
+            self.assertIsNone(decode_cursor(token))
+
+    def test_pages_cover_every_row_once_with_equal_timestamps(self):
+        when = timezone.now()
+        # Several rows share a timestamp, so the primary key breaks ties
+        ids = [make_prediction(created_at=when - timedelta(minutes=i // 3)).pk for i in range(10)]
+        queryset = Prediction.objects.order_by('-created_at', '-pk')
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(queryset, cursor, 4)
+            seen.extend(row.pk for row in rows)
+            if cursor is None:
+                break
+            cursor = decode_cursor(cursor)
+
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(seen, list(queryset.values_list('pk', flat=True)))
+
+    def test_filtered_count_is_capped(self):
+        for _ in range(5):
+            make_prediction()
+        paginator = EstimatedCountPaginator(Prediction.objects.filter(city='Delhi'), 2)
+        paginator.count_cap = 3
+        self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.is_estimated)
+
+
+class PredictionAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.url = reverse('admin:predictor_prediction_changelist')
+
+    def test_changelist_pages_by_cursor(self):
+        for _ in range(3):
+            make_prediction()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, {'after': encode_cursor(timezone.now(), 10 ** 6)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+    def test_filter_by_choice(self):
+        make_prediction(city='Delhi')
+        make_prediction(city='Mumbai')
+        response = self.client.get(self.url, {'city': 'Mumbai'})
+        self.assertEqual([row.city for row in response.context['cl'].result_list], ['Mumbai'])
+
+    def test_unknown_filter_value_redirects_instead_of_failing(self):
+        make_prediction()
+        for params in ({'city': 'Pune'}, {'weather': 'Hail'}, {'congestion_level': 'Gridlock'}):
+            response = self.client.get(self.url, params)
+            self.assertRedirects(response, f'{self.url}?e=1', fetch_redirect_response=False)
+
+
+class PageCachingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_request_is_not_modified(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        self.client.get(reverse('about'))
+        with mock.patch('predictor.views.render') as render:
+            response = self.client.get(reverse('about'))
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalidate_changes_etag(self):
+        etag = self.client.get(reverse('home'))['ETag']
+        invalidate('pages')
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_parent_namespace_invalidates_children(self):
+        delhi = cache_version('news:Delhi')
+        mumbai = cache_version('news:Mumbai')
+        invalidate_news('Delhi')
+        self.assertGreater(cache_version('news:Delhi'), delhi)
+        self.assertEqual(cache_version('news:Mumbai'), mumbai)
+
+        invalidate_news()
+        self.assertGreater(cache_version('news:Mumbai'), mumbai)
+
+    def test_authenticated_pages_are_not_shared(self):
+        self.client.get(reverse('about'))
+        self.client.force_login(User.objects.create_user('commuter', password='password'))
+        with mock.patch('predictor.views.render', return_value=HttpResponse('fresh')) as render:
+            response = self.client.get(reverse('about'))
+        render.assert_called_once()
+        self.assertEqual(response.content, b'fresh')
+
+
+@mock.patch.object(predictor, 'fetch_weather', return_value='Clear')
+class ScenarioForecastTests(TestCase):
+    COORDS = {'Saket': (28.52, 77.21), 'Noida': (28.53, 77.39)}
+
+    def setUp(self):
+        user = User.objects.create_user('commuter', password='password')
+        self.scenario = SavedScenario.objects.create(
+            user=user, name='Commute', city='Delhi', source='Saket', destination='Noida'
+        )
+
+    def test_upcoming_hours_start_on_the_hour(self, fetch_weather):
+        start = timezone.now().replace(minute=37)
+        slots = upcoming_hours(start, 3)
+        self.assertEqual(len(slots), 3)
+        self.assertEqual(slots[0], start.replace(minute=0, second=0, microsecond=0))
+        self.assertEqual(slots[2] - slots[0], timedelta(hours=2))
+
+    def test_forecast_reuses_geocoded_route(self, fetch_weather):
+        with mock.patch.object(predictor, 'geocode', side_effect=self.COORDS.get) as geocode:
+            self.assertEqual(precompute_forecasts(hours=3), 1)
+            self.assertEqual(geocode.call_count, 2)
+            self.assertEqual(precompute_forecasts(hours=3), 1)
+            self.assertEqual(geocode.call_count, 2)
+
+        forecast = ScenarioForecast.objects.get(scenario=self.scenario)
+        self.assertEqual((forecast.source_lat, forecast.dest_lon), (28.52, 77.39))
+        self.assertEqual(len(forecast.hourly), 3)
+
+    def test_route_change_and_regeocode_refresh_coordinates(self, fetch_weather):
+        with mock.patch.object(predictor, 'geocode', side_effect=self.COORDS.get) as geocode:
+            precompute_forecasts(hours=1)
+            precompute_forecasts(hours=1, regeocode=True)
+            self.assertEqual(geocode.call_count, 4)
+
+            self.scenario.destination = 'Saket'
+            self.scenario.source = 'Noida'
+            self.scenario.save()
+            precompute_forecasts(hours=1)
+            self.assertEqual(geocode.call_count, 6)
+        self.assertEqual(ScenarioForecast.objects.get().source_lat, 28.53)
+
+    def test_forecast_for_an_edited_route_is_not_shown(self, fetch_weather):
+        with mock.patch.object(predictor, 'geocode', side_effect=self.COORDS.get):
+            precompute_forecasts(hours=1)
+        self.scenario.destination = 'Gurugram'
+        self.scenario.save()
+
+        scenario = SavedScenario.objects.select_related('forecast').get()
+        self.assertIsNone(serialize_forecast(scenario)['forecast'])
+        self.client.force_login(scenario.user)
+        self.assertContains(self.client.get(reverse('dashboard')), 'Forecast not computed yet')
+
+        with mock.patch.object(predictor, 'geocode', side_effect=self.COORDS.get):
+            self.assertEqual(precompute_forecasts(hours=1), 0)
+        self.assertFalse(ScenarioForecast.objects.exists())
+
+    def test_failed_regeocode_keeps_the_forecast(self, fetch_weather):
+        with mock.patch.object(predictor, 'geocode', side_effect=self.COORDS.get):
+            precompute_forecasts(hours=1)
+        with mock.patch.object(predictor, 'geocode', return_value=None):
+            precompute_forecasts(hours=1, regeocode=True)
+        self.assertTrue(ScenarioForecast.objects.exists())
+
+    def test_ungeocoded_route_is_skipped_and_retried(self, fetch_weather):
+        with mock.patch.object(predictor, 'geocode', return_value=None):
+            self.assertEqual(precompute_forecasts(hours=1), 0)
+        self.assertFalse(ScenarioForecast.objects.exists())
+
+        with mock.patch.object(predictor, 'geocode', side_effect=self.COORDS.get):
+            self.assertEqual(precompute_forecasts(hours=1), 1)
+        self.assertTrue(ScenarioForecast.objects.exists())
+
+    def test_compact_serialization(self, fetch_weather):
+        with mock.patch.object(predictor, 'geocode', side_effect=self.COORDS.get):
+            precompute_forecasts(hours=2)
+        scenario = SavedScenario.objects.select_related('forecast').get()
+        data = serialize_forecast(scenario, compact=True)
+        self.assertEqual(data['forecast']['hourly']['columns'], list(HOURLY_COLUMNS))
+        self.assertEqual(len(data['forecast']['hourly']['rows']), 2)
+        self.assertFalse(data['forecast']['stale'])
+
+
+class AdmissionTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().post('/predict-ajax/', REMOTE_ADDR='10.0.0.1')
+        self.request.user = AnonymousUser()
+
+    def test_token_bucket_allows_burst_then_refills(self):
+        limiter = admission.TokenBucketLimiter(rate=2.0, burst=2)
+        with mock.patch('predictor.services.admission.time.monotonic', return_value=100.0) as now:
+            self.assertEqual(limiter.allow('a'), 0)
+            self.assertEqual(limiter.allow('a'), 0)
+            self.assertAlmostEqual(limiter.allow('a'), 0.5)
+            # Other clients have their own bucket
+            self.assertEqual(limiter.allow('b'), 0)
+            now.return_value = 100.5
+            self.assertEqual(limiter.allow('a'), 0)
+
+    def test_concurrency_limiter_caps_slots(self):
+        limiter = admission.ConcurrencyLimiter(limit=1, timeout=0.01)
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+        limiter.release()
+        self.assertTrue(limiter.acquire(timeout=0))
+
+    def test_rate_limited_client_is_refused(self):
+        with mock.patch.object(admission, 'rate_limiter', admission.TokenBucketLimiter(1.0, 1)), \
+                mock.patch.object(predictor, 'predict_traffic', return_value={}) as predict:
+            admission.admit_prediction(self.request, 'Delhi', 'Saket', 'Noida')
+            with self.assertRaises(admission.RateLimited) as raised:
+                admission.admit_prediction(self.request, 'Delhi', 'Saket', 'Noida')
+        self.assertEqual(raised.exception.reason, 'rate_limited')
+        self.assertEqual(predict.call_count, 1)
+
+    def test_saturated_requests_are_degraded_or_rejected(self):
+        busy = admission.ConcurrencyLimiter(limit=1, timeout=0)
+        busy.acquire()
+        with mock.patch.object(admission, 'concurrency_limiter', busy), \
+                mock.patch.object(predictor, 'predict_traffic') as predict:
+            with self.settings(PREDICTION_ADMISSION={'SHED_MODE': 'degrade'}), \
+                    mock.patch.dict(predictor.geocode_cache, {'saket': (28.52, 77.21), 'noida': (28.53, 77.39)}):
+                with mock.patch.object(predictor, 'geocode') as geocode:
+                    result = admission.admit_prediction(self.request, 'Delhi', 'Saket', 'Noida')
+                geocode.assert_not_called()
+                self.assertTrue(result['degraded'])
+                self.assertEqual(result['coordinates']['destination'], (28.53, 77.39))
+                self.assertIsNone(result['suggested_mode'])
+                self.assertIsNone(serialize_prediction(result)['distance_km'])
+            with self.settings(PREDICTION_ADMISSION={'SHED_MODE': 'reject'}):
+                with self.assertRaises(admission.RateLimited) as raised:
+                    admission.admit_prediction(self.request, 'Delhi', 'Saket', 'Noida')
+                self.assertEqual(raised.exception.reason, 'overloaded')
+        predict.assert_not_called()
+
+    def test_shed_route_without_cached_coordinates_is_rejected(self):
+        busy = admission.ConcurrencyLimiter(limit=1, timeout=0)
+        busy.acquire()
+        with mock.patch.object(admission, 'concurrency_limiter', busy), \
+                self.settings(PREDICTION_ADMISSION={'SHED_MODE': 'degrade'}), \
+                mock.patch.dict(predictor.geocode_cache, {'saket': (28.52, 77.21)}):
+            with self.assertRaises(admission.RateLimited) as raised:
+                admission.admit_prediction(self.request, 'Delhi', 'Saket', 'Noida')
+        self.assertEqual(raised.exception.reason, 'overloaded')
+    
+    def test_degraded_prediction_is_not_saved(self):
+        degraded = sample_result(suggested_mode=None, degraded=True)
+        degraded['features']['distance_km'] = None
+        with mock.patch.object(admission, 'admit', return_value=degraded):
+            response = self.client.post(reverse('predict'), {'city': 'Delhi', 'source': 'Saket',
+                                                             'destination': 'Noida'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'not saved to your history')
+        self.assertNotContains(response, 'Distance:</span>')
+        self.assertFalse(Prediction.objects.exists())
+        self.assertFalse(Location.objects.exists())
+    
+    def test_ajax_answers_429_with_retry_after(self):
+        with mock.patch.object(admission, 'rate_limiter', admission.TokenBucketLimiter(1.0, 0)):
+            response = self.client.post(reverse('predict_ajax'), {'city': 'Delhi', 'source': 'Saket',
+                                                                  'destination': 'Noida'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+def sample_result(**kwargs):
+    """A predict_traffic result for the Saket -> Noida route"""
+    result = {
+        'congestion_level': 'High',
+        'suggested_mode': 'Metro',
+        'probabilities': [0.1, 0.2, 0.7],
+        'features': {
+            'city': 'Delhi',
+            'distance_km': 17.0,
+            'hour': 9,
+            'weekday': 1,
+            'day_type': 'weekday',
+            'weather': 'Clear',
+            'event': False,
+            'route_type': 'highway',
+        },
+        'coordinates': {'source': (28.52, 77.21), 'destination': (28.53, 77.39)},
+        'degraded_stages': [],
+        'geocoded': {'source': True, 'destination': True},
+    }
+    result.update(kwargs)
+    return result
+
+
+@mock.patch.object(admission, 'admit', return_value=sample_result())
+class LiveCongestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('commuter', password='password')
+        self.scenario = SavedScenario.objects.create(
+            user=self.user, name='Commute', city='Delhi', source='Saket', destination='Noida'
+        )
+
+    async def stop_feeds(self):
+        # The test client does not close the view's generator the way ASGI servers do
+        for feed in list(live.feeds.values()):
+            feed.task.cancel()
+        await asyncio.sleep(0)
+        live.feeds.clear()
+
+    def test_wsgi_request_gets_501(self, admit):
+        response = self.client.get(reverse('live_congestion', args=['Delhi']))
+        self.assertEqual(response.status_code, 501)
+        admit.assert_not_called()
+
+    async def test_unknown_city(self, admit):
+        response = await self.async_client.get(reverse('live_congestion', args=['Atlantis']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_watchers_share_one_feed_through_admission(self, admit):
+        url = reverse('live_congestion', args=['Delhi'])
+        first = await self.async_client.get(url)
+        second = await self.async_client.get(url)
+        self.assertEqual(first['Content-Type'], 'text/event-stream')
+
+        streams = [first.streaming_content, second.streaming_content]
+        for stream in streams:
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        with mock.patch.object(admission, 'admit_city', return_value=sample_result()) as admit_city:
+            for stream in streams:
+                event = await anext(stream)
+                self.assertIn(b'event: congestion', event)
+                self.assertIn(b'"congestion_level":"High"', event)
+                self.assertNotIn(b'suggested_mode', event)
+                self.assertNotIn(b'"source"', event)
+        self.assertEqual(len(live.feeds), 1)
+        admit.assert_not_called()
+        self.assertEqual(admit_city.call_count, 1)
+        self.assertEqual(admit_city.call_args.args[:3], ('live:Delhi', 'Delhi', live.city_distance('Delhi')))
+
+        await self.stop_feeds()
+
+    def test_city_feed_scores_a_representative_trip(self, admit):
+        distance = live.city_distance('Delhi')
+        self.assertGreater(distance, 5)
+        with mock.patch.object(predictor, 'fetch_weather', return_value='Clear'):
+            result = admission.admit_city('live:Delhi', 'Delhi', distance)
+        self.assertEqual(result['features']['distance_km'], distance)
+        self.assertNotEqual(result['features']['route_type'], predictor.get_route_type(0))
+        self.assertEqual(predictor.predict_city_degraded('Delhi', distance)['features']['distance_km'], distance)
+
+    async def test_last_watcher_stops_the_feed(self, admit):
+        async with aclosing(live.event_stream('Delhi', 'Saket', 'Noida')) as stream:
+            await anext(stream)
+            await anext(stream)
+            task = live.feeds[('Delhi', 'Saket', 'Noida')].task
+        await asyncio.sleep(0)
+        self.assertEqual(live.feeds, {})
+        self.assertTrue(task.cancelled())
+
+    async def test_saved_route_needs_its_owner(self, admit):
+        url = reverse('live_congestion', args=['Delhi'])
+        response = await self.async_client.get(url, {'scenario': self.scenario.id})
+        self.assertEqual(response.status_code, 403)
+
+        await self.async_client.aforce_login(self.user)
+        for scenario in ('999', 'x'):
+            response = await self.async_client.get(url, {'scenario': scenario})
+            self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse('live_congestion', args=['Mumbai']),
+                                               {'scenario': self.scenario.id})
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.get(url, {'scenario': self.scenario.id})
+        stream = response.streaming_content
+        await anext(stream)
+        event = await anext(stream)
+        self.assertIn(b'"source":"Saket"', event)
+        self.assertIn(b'"suggested_mode":"Metro"', event)
+        await self.stop_feeds()
+
+    async def test_feed_cap(self, admit):
+        with mock.patch.object(live, 'MAX_FEEDS', 0):
+            response = await self.async_client.get(reverse('live_congestion', args=['Delhi']))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+
+class SerializerTests(TestCase):
+    def test_parse_fields(self):
+        self.assertEqual(parse_fields(None), DEFAULT_FIELDS)
+        self.assertEqual(parse_fields(''), DEFAULT_FIELDS)
+        self.assertEqual(parse_fields([]), DEFAULT_FIELDS)
+        self.assertEqual(parse_fields('weather, hour,'), ('weather', 'hour'))
+        self.assertEqual(parse_fields(['weather', 'hour']), ('weather', 'hour'))
+        for value in ('weather,speed', ['speed'], 5, {'weather': True}, ['weather', 1]):
+            with self.assertRaises(InvalidFields):
+                parse_fields(value)
+
+    def test_serialize_prediction_converts_numpy_values(self):
+        result = sample_result(congestion_level=np.str_('High'), probabilities=np.array([0.1, 0.2, 0.7]))
+        result['features']['hour'] = np.int64(9)
+        data = serialize_prediction(result, ('congestion_level', 'probabilities', 'hour', 'features'))
+        self.assertEqual(data['version'], SCHEMA_VERSION)
+        self.assertEqual(list(data), ['version', 'congestion_level', 'probabilities', 'hour', 'features'])
+        self.assertIs(type(data['congestion_level']), str)
+        self.assertEqual(data['probabilities'], [0.1, 0.2, 0.7])
+        self.assertIs(type(data['features']['hour']), int)
+        self.assertEqual(api_response(data).content.count(b' '), 0)
+
+    def test_serialize_rows(self):
+        data = serialize_rows([{'a': 1, 'b': 2}, {'a': 3}], ['a', 'b'])
+        self.assertEqual(data['rows'], [[1, 2], [3, None]])
+
+    @mock.patch.object(admission, 'admit', return_value=sample_result())
+    def test_ajax_fields_from_query_or_body(self, admit):
+        url = reverse('predict_ajax')
+        body = {'city': 'Delhi', 'source': 'Saket', 'destination': 'Noida'}
+
+        response = self.client.post(f'{url}?fields=weather', body, content_type='application/json')
+        self.assertEqual(response.json(), {'version': SCHEMA_VERSION, 'weather': 'Clear'})
+
+        response = self.client.post(url, {**body, 'fields': ['hour']}, content_type='application/json')
+        self.assertEqual(response.json(), {'version': SCHEMA_VERSION, 'hour': 9})
+
+        response = self.client.post(url, {**body, 'fields': {'hour': 1}}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+def tile_for(lat, lon, z):
+    """x, y of the Web Mercator tile containing a point"""
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return x, y
+
+
+class HeatmapTileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(tiles, 'TILES_ROOT', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tiles.store_grid('Delhi', 9, bytes(range(256)) * 9, 'v1')
+
+    def test_valid_tile(self):
+        self.assertTrue(tiles.valid_tile(0, 0, 0))
+        self.assertTrue(tiles.valid_tile(9, 511, 511))
+        for z, x, y in ((9, 512, 0), (9, 0, 512), (-1, 0, 0), (tiles.MAX_ZOOM + 1, 0, 0), (3, -1, 0)):
+            self.assertFalse(tiles.valid_tile(z, x, y))
+
+    def test_tile_in_bounds(self):
+        x, y = tile_for(28.64, 77.10, 9)
+        self.assertTrue(tiles.tile_in_bounds('Delhi', 9, x, y))
+        self.assertFalse(tiles.tile_in_bounds('Delhi', 9, *tile_for(19.07, 72.87, 9)))
+        self.assertFalse(tiles.tile_in_bounds('Delhi', 9, 99999, 99999))
+
+    def test_tile_is_served_and_revalidated(self):
+        x, y = tile_for(28.64, 77.10, 11)
+        url = reverse('heatmap_tile', args=['Delhi', 9, 11, x, y])
+        response = self.client.get(url, {'v': 'v1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG\r\n\x1a\n'))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_out_of_range_tiles_are_not_found(self):
+        for args in (['Delhi', 9, 9, 99999, 99999], ['Delhi', 9, 3, 8, 0], ['Delhi', 24, 0, 0, 0],
+                     ['Delhi', 10, 0, 0, 0], ['Pune', 9, 0, 0, 0]):
+            response = self.client.get(reverse('heatmap_tile', args=args))
+            self.assertEqual(response.status_code, 404)
+
+    def test_tile_url_template_only_for_built_hours(self):
+        self.assertEqual(tiles.tile_url_template('Delhi', 9), '/tiles/Delhi/9/{z}/{x}/{y}?v=v1')
+        self.assertIsNone(tiles.tile_url_template('Delhi', 10))
+
+
+class DatabaseRoutingTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('predictor.db.replica_available', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReadReplicaRouter()
+
+    def test_reads_use_replica_only_inside_replica_views(self):
+        self.assertEqual(self.router.db_for_read(Prediction), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Prediction), 'replica')
+            self.assertEqual(self.router.db_for_write(Prediction), 'default')
+
+    def test_sessions_and_accounts_stay_on_primary(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def middleware_response(self, request, write=False):
+        routes = []
+
+        def view(request):
+            routes.append(self.router.db_for_read(Prediction))
+            if write:
+                make_prediction()
+            return HttpResponse()
+
+        with self.settings(READ_REPLICA_PATHS=['/admin/'], READ_REPLICA_PIN_SECONDS=5):
+            response = ReadReplicaMiddleware(view)(request)
+        return response, routes[0]
+
+    def test_writes_pin_the_client_to_primary(self):
+        factory = RequestFactory()
+        response, route = self.middleware_response(factory.get('/admin/'))
+        self.assertEqual(route, 'replica')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response, route = self.middleware_response(factory.post('/predict/'), write=True)
+        self.assertEqual(route, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+
+        factory.cookies[PIN_COOKIE] = '1'
+        response, route = self.middleware_response(factory.get('/admin/'))
+        self.assertEqual(route, 'default')
+
+    async def test_async_requests_are_routed_and_pinned(self):
+        routes = []
+
+        async def view(request):
+            routes.append(self.router.db_for_read(Prediction))
+            await sync_to_async(make_prediction)()
+            return HttpResponse()
+
+        with self.settings(READ_REPLICA_PATHS=['/admin/'], READ_REPLICA_PIN_SECONDS=5):
+            middleware = ReadReplicaMiddleware(view)
+            self.assertTrue(iscoroutinefunction(middleware))
+            response = await middleware(RequestFactory().get('/admin/'))
+        self.assertEqual(routes, ['replica'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_login_pins_the_client(self):
+        User.objects.create_user('commuter', password='password')
+        response = self.client.post(reverse('login'), {'username': 'commuter', 'password': 'password'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pragmas_skip_journal_mode_on_read_only_connections(self):
+        db = sqlite3.connect(':memory:')
+        cursor = db.cursor()
+        apply_sqlite_pragmas(cursor, {'journal_mode': 'OFF', 'synchronous': 'OFF'}, writable=False)
+        self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'memory')
+        self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 0)
+        db.close()
+
+
+class FakeModel:
+    """Stands in for a pickled scikit-learn classifier"""
+
+    classes_ = ['High', 'Low', 'Medium']
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, rows):
+        self.calls += 1
+        return ['High'] * len(rows)
+
+    def predict_proba(self, rows):
+        return [[0.7, 0.1, 0.2]] * len(rows)
+
+
+def make_evaluator(model=None, **kwargs):
+    options = {'workers': 1, 'queue_size': 10, 'batch_size': 1, 'batch_wait': 0, 'flush_interval': 3600}
+    options.update(kwargs)
+    return shadow.ShadowEvaluator([shadow.Candidate('candidate', model or FakeModel(), 'c1')], 'p1', **options)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Condition not met in time')
+        time.sleep(0.01)
+
+
+class ShadowEvaluationTests(TestCase):
+    SAMPLE = (['Delhi', 17.0, 9, 1, 'weekday', 'Clear', False, 'highway'], 'High', [0.1, 0.2, 0.7],
+              ('Low', 'Medium', 'High'), 0.002)
+
+    def test_probability_delta_matches_labels(self):
+        self.assertEqual(shadow.probability_delta(['Low', 'High'], [0.2, 0.8], ['High', 'Low'], [0.8, 0.2]), 0)
+        self.assertAlmostEqual(shadow.probability_delta(['Low'], [1.0], ['High'], [1.0]), 1.0)
+
+    def test_full_queue_drops_samples(self):
+        evaluator = make_evaluator(workers=0, queue_size=1)
+        self.assertTrue(evaluator.submit(*self.SAMPLE))
+        self.assertFalse(evaluator.submit(*self.SAMPLE))
+        self.assertEqual(evaluator.dropped, 1)
+
+    def test_worker_survives_scoring_errors(self):
+        model = FakeModel()
+        evaluator = make_evaluator(model)
+        with mock.patch.object(shadow, 'probability_delta', side_effect=[ValueError('boom'), 0.1]):
+            evaluator.submit(*self.SAMPLE)
+            wait_until(lambda: model.calls == 1)
+            evaluator.submit(*self.SAMPLE)
+            wait_until(lambda: model.calls == 2)
+        self.assertTrue(evaluator.threads[0].is_alive())
+
+    def test_stopped_worker_is_restarted(self):
+        evaluator = make_evaluator()
+        with mock.patch.object(evaluator, '_run') as run:
+            evaluator.submit(*self.SAMPLE)
+            evaluator.threads[0].join()
+            evaluator.submit(*self.SAMPLE)
+            evaluator.threads[0].join()
+        self.assertEqual(run.call_count, 2)
+
+    def test_flush_records_window(self):
+        evaluator = make_evaluator(workers=0)
+        evaluator._score([self.SAMPLE, self.SAMPLE])
+        evaluator._flush_due()
+        self.assertFalse(ShadowEvaluation.objects.exists())
+        evaluator.next_flush = 0
+        evaluator._flush_due()
+
+        row = ShadowEvaluation.objects.get()
+        self.assertEqual((row.samples, row.agreements, row.batches), (2, 2, 1))
+        self.assertEqual(row.agreement_rate, 1.0)
+        # Same probabilities once matched by label, despite the different class order
+        self.assertAlmostEqual(row.probability_delta, 0.0)
+
+    def test_workers_share_one_window(self):
+        evaluator = make_evaluator(workers=2)
+        for _ in range(4):
+            evaluator.submit(*self.SAMPLE)
+        wait_until(lambda: evaluator.window['candidate'].samples == 4)
+        self.assertEqual(len(evaluator.threads), 2)
+        evaluator.dropped = 3
+        with mock.patch.object(evaluator, '_flush') as flush:
+            evaluator.next_flush = 0
+            # Whichever thread gets there first flushes, exactly once
+            evaluator._flush_due()
+            wait_until(lambda: flush.call_count == 1)
+        window, _, _, dropped = flush.call_args.args
+        self.assertEqual((window['candidate'].samples, window['candidate'].batches, dropped), (4, 4, 3))
+        self.assertEqual(evaluator.window['candidate'].samples, 0)
+
+    def test_shadow_failure_keeps_the_primary_prediction(self):
+        features = sample_result()['features']
+        evaluator = mock.Mock(**{'submit.side_effect': RuntimeError('queue gone')})
+        with mock.patch.object(predictor, 'model', FakeModel()), mock.patch.object(predictor, 'shadow', evaluator):
+            prediction, probabilities = predictor.predict_congestion(features)
+        evaluator.submit.assert_called_once()
+        self.assertEqual((prediction, probabilities), ('High', [0.7, 0.1, 0.2]))
+
+
+class LatencyBudgetTests(TestCase):
+    def test_deadline_without_limit(self):
+        deadline = Deadline()
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired())
+        self.assertEqual(deadline.timeout(cap=5), 5)
+
+    def test_deadline_timeouts_shrink_with_time(self):
+        with mock.patch('predictor.services.deadline.time.monotonic', return_value=100.0) as now:
+            deadline = Deadline(2.0)
+            self.assertEqual(deadline.timeout(cap=5), 2.0)
+            self.assertEqual(deadline.timeout(cap=1), 1)
+            now.return_value = 101.5
+            self.assertAlmostEqual(deadline.timeout(reserve=0.25), 0.25)
+            self.assertFalse(deadline.expired(reserve=0.25))
+            now.return_value = 103.0
+            self.assertEqual(deadline.remaining(), 0.0)
+            self.assertTrue(deadline.expired())
+
+    def test_budget_header(self):
+        factory = RequestFactory()
+        self.assertEqual(deadline_from_request(factory.post('/')).budget, 3.0)
+        self.assertEqual(deadline_from_request(factory.post('/', HTTP_X_LATENCY_BUDGET_MS='800')).budget, 0.8)
+        self.assertEqual(deadline_from_request(factory.post('/', HTTP_X_LATENCY_BUDGET_MS='60000')).budget, 10.0)
+        for value in ('soon', '0', '-5', 'nan'):
+            with self.assertRaises(InvalidBudget):
+                deadline_from_request(factory.post('/', HTTP_X_LATENCY_BUDGET_MS=value))
+
+    def test_invalid_budget_is_a_bad_request(self):
+        response = self.client.post(reverse('predict_ajax'), {'city': 'Delhi', 'source': 'Saket',
+                                                              'destination': 'Noida'},
+                                    content_type='application/json', HTTP_X_LATENCY_BUDGET_MS='soon')
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch.object(predictor, 'fetch_weather', return_value='Clear')
+    def test_failed_geocode_uses_offline_coordinates(self, fetch_weather):
+        with mock.patch.object(predictor, 'geocode', return_value=None), \
+                mock.patch.object(predictor, 'get_cached_coordinates') as cached:
+            result = predictor.predict_traffic('Delhi', 'Andheri, Mumbai', 'Delhi Gate', Deadline(5))
+        cached.assert_not_called()
+        self.assertEqual(result['coordinates']['source'], CITY_COORDS['Mumbai'])
+        self.assertEqual(result['coordinates']['destination'], CITY_COORDS['Delhi'])
+        self.assertEqual(result['degraded_stages'], ['geocode'])
+
+    def test_exhausted_budget_uses_cached_coordinates(self):
+        predictor.geocode_cache['saket'] = (28.52, 77.21)
+        self.addCleanup(predictor.geocode_cache.pop, 'saket')
+        with mock.patch.object(predictor, 'geocode') as geocode, \
+                mock.patch.object(predictor, 'fetch_weather') as fetch_weather:
+            result = predictor.predict_traffic('Delhi', 'Saket', 'Noida', Deadline(0))
+        geocode.assert_not_called()
+        fetch_weather.assert_not_called()
+        self.assertEqual(result['coordinates']['source'], (28.52, 77.21))
+        self.assertEqual(result['coordinates']['destination'], CITY_COORDS['Delhi'])
+        self.assertEqual(result['degraded_stages'], ['geocode', 'weather', 'inference'])
+
+    def test_slow_geocode_falls_back_once_the_budget_runs_out(self):
+        def slow_geocode(location, timeout=None):
+            time.sleep(timeout)
+
+        with self.settings(PREDICTION_LATENCY_BUDGET={'INFERENCE_RESERVE': 0.01}), \
+                mock.patch.object(predictor, 'geocode', side_effect=slow_geocode), \
+                mock.patch.object(predictor, 'get_coordinates_offline') as offline:
+            result = predictor.predict_traffic('Delhi', 'Saket', 'Noida', Deadline(0.05))
+        offline.assert_not_called()
+        self.assertEqual(result['coordinates']['source'], CITY_COORDS['Delhi'])
+        self.assertIn('geocode', result['degraded_stages'])
+
+    @mock.patch.object(admission, 'admit', return_value=sample_result(degraded_stages=['weather']))
+    def test_predict_page_reports_degraded_stages(self, admit):
+        response = self.client.post(reverse('predict'), {'city': 'Delhi', 'source': 'Saket', 'destination': 'Noida'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'uses fallbacks for: live weather')
+
+
+class CompactStorageTests(TestCase):
+    def test_codes_round_trip(self):
+        prediction = make_prediction(city='Mumbai', weather='Rain', congestion_level='Low', suggested_mode='Walk')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT city, weather, congestion_level, suggested_mode FROM predictor_prediction')
+            self.assertEqual(cursor.fetchone(), (1, 2, 0, 3))
+
+        prediction = Prediction.objects.get(pk=prediction.pk)
+        self.assertEqual((prediction.city, prediction.weather, prediction.congestion_level),
+                         ('Mumbai', 'Rain', 'Low'))
+        self.assertEqual(Prediction.objects.filter(city='Mumbai', congestion_level__in=['Low', 'High']).count(), 1)
+        self.assertEqual(Prediction.objects.filter(weather='Clear').count(), 0)
+
+    def test_unknown_values_are_validation_errors(self):
+        with self.assertRaises(ValidationError):
+            Prediction.objects.filter(city='Pune')
+        with self.assertRaises(ValidationError):
+            make_prediction(weather='Hail')
+        prediction = Prediction(city='Pune')
+        with self.assertRaises(ValidationError) as raised:
+            prediction.full_clean()
+        self.assertIn('city', raised.exception.message_dict)
+
+    def test_field_deconstructs_with_values(self):
+        field = Prediction._meta.get_field('congestion_level')
+        name, path, args, kwargs = field.deconstruct()
+        self.assertEqual(path, 'predictor.fields.CodeField')
+        self.assertEqual(kwargs['values'], ('Low', 'Medium', 'High'))
+        self.assertNotIn('choices', kwargs)
+
+    def test_remember_keeps_geocoded_coordinates(self):
+        fallback = Location.remember('Saket', (28.70, 77.10), geocoded=False)
+        self.assertFalse(fallback.geocoded)
+
+        location = Location.remember('Saket', (28.52, 77.21), geocoded=True)
+        self.assertEqual((location.pk, location.latitude, location.geocoded), (fallback.pk, 28.52, True))
+
+        location = Location.remember('Saket', (28.70, 77.10), geocoded=False)
+        location.refresh_from_db()
+        self.assertEqual((location.latitude, location.longitude), (28.52, 77.21))
+
+    @mock.patch.object(predictor, 'fetch_weather', return_value='Clear')
+    def test_stored_locations_skip_nominatim(self, fetch_weather):
+        Location.remember('Saket', (28.52, 77.21), geocoded=True)
+        Location.remember('Noida', (28.70, 77.10), geocoded=False)
+        with mock.patch.object(predictor, 'geocode', return_value=(28.53, 77.39)) as geocode:
+            result = predictor.predict_traffic('Delhi', 'Saket', 'Noida', Deadline(5))
+        geocode.assert_called_once_with('Noida', mock.ANY)
+        self.assertEqual(result['coordinates']['source'], (28.52, 77.21))
+        self.assertEqual(result['geocoded'], {'source': True, 'destination': True})
+        self.assertEqual(result['degraded_stages'], [])
+
+    def test_predict_page_tracks_geocoding_per_endpoint(self):
+        Location.remember('Noida', (28.53, 77.39), geocoded=True)
+        result = sample_result(coordinates={'source': (28.52, 77.21), 'destination': (28.61, 77.20)},
+                               geocoded={'source': True, 'destination': False}, degraded_stages=['geocode'])
+        with mock.patch.object(admission, 'admit', return_value=result):
+            self.client.post(reverse('predict'), {'city': 'Delhi', 'source': 'Saket', 'destination': 'Noida'})
+
+        prediction = Prediction.objects.select_related('source', 'destination').get()
+        self.assertTrue(prediction.source.geocoded)
+        self.assertEqual((prediction.dest_lat, prediction.dest_lon), (28.53, 77.39))
+
+
+def make_article(title, city='Delhi', days_ago=0, **kwargs):
+    values = {
+        'city': city,
+        'url': f'https://news.example.com/{city}/{title.replace(" ", "-")}',
+        'title': title,
+        'published_at': timezone.now() - timedelta(days=days_ago),
+    }
+    values.update(kwargs)
+    return NewsArticle.objects.create(**values)
+
+
+class NewsStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fts_query_quotes_words_as_prefixes(self):
+        self.assertEqual(news.fts_query('metro  line'), '"metro"* "line"*')
+        self.assertEqual(news.fts_query('say "hi" OR'), '"say"* """hi"""* "OR"*')
+        self.assertEqual(news.fts_query(''), '')
+
+    def test_search_follows_inserts_updates_and_deletes(self):
+        article = make_article('Metro line opens', description='Faster commutes to Noida')
+        make_article('Flyover delayed')
+
+        def titles(text):
+            return [row.title for row in news.articles_page('Delhi', text)[0]]
+
+        self.assertEqual(titles('metr'), ['Metro line opens'])
+        self.assertEqual(titles('commute noida'), ['Metro line opens'])
+        self.assertEqual(titles('metro flyover'), [])
+        self.assertEqual(titles('"unbalanced'), [])
+
+        article.title = 'Signal upgrade finished'
+        article.save()
+        self.assertEqual(titles('metro'), [])
+        self.assertEqual(titles('signal'), ['Signal upgrade finished'])
+
+        article.delete()
+        self.assertEqual(titles('signal'), [])
+
+    def test_articles_page_is_newest_first_per_city(self):
+        for day in range(5):
+            make_article(f'Delhi story {day}', days_ago=day)
+        make_article('Mumbai story', city='Mumbai')
+
+        rows, cursor = news.articles_page('Delhi', per_page=3)
+        self.assertEqual([row.title for row in rows], ['Delhi story 0', 'Delhi story 1', 'Delhi story 2'])
+        rows, cursor = news.articles_page('Delhi', cursor=decode_cursor(cursor), per_page=3)
+        self.assertEqual([row.title for row in rows], ['Delhi story 3', 'Delhi story 4'])
+        self.assertIsNone(cursor)
+
+    def test_ingest_deduplicates_by_url(self):
+        make_article('Already stored', url='https://news.example.com/a')
+        items = [
+            {'url': 'https://news.example.com/a', 'title': 'Already stored'},
+            {'url': 'https://news.example.com/b', 'title': 'New', 'publishedAt': '2024-05-01T08:00:00Z',
+             'source': {'name': 'The Hindu'}},
+            {'url': 'https://news.example.com/b', 'title': 'New again'},
+            {'url': 'javascript:alert(1)', 'title': 'Bad URL'},
+            {'url': 'https://news.example.com/c', 'title': None},
+        ]
+        version = news.stored_version('Delhi')
+        with mock.patch.object(news, 'fetch_news_articles', return_value=items):
+            self.assertEqual(news.ingest_news('Delhi'), 1)
+            self.assertEqual(news.ingest_news('Delhi'), 0)
+
+        article = NewsArticle.objects.get(url='https://news.example.com/b')
+        self.assertEqual((article.title, article.source_name), ('New', 'The Hindu'))
+        self.assertEqual(article.published_at.year, 2024)
+        self.assertNotEqual(news.stored_version('Delhi'), version)
+        self.assertEqual(news.stored_version('Mumbai'), '0-0')
+
+    def test_cached_news_page_follows_the_store(self):
+        # The fetcher writes from another process, so nothing invalidates this process's cache
+        url = reverse('news')
+        first = self.client.get(url, {'city': 'Delhi'})
+        self.assertContains(first, 'has not been fetched yet')
+
+        article = make_article('Metro line opens')
+        response = self.client.get(url, {'city': 'Delhi'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, 'Metro line opens')
+
+        article.delete()
+        self.assertContains(self.client.get(url, {'city': 'Delhi'}), 'has not been fetched yet')
+
+    def test_synthetic_news_only_stands_in_until_a_real_fetch(self):
+        with mock.patch.object(news, 'fetch_news_articles', side_effect=Exception('offline')):
+            self.assertEqual(news.ingest_news('Delhi'), 10)
+            self.assertEqual(news.ingest_news('Delhi'), 0)
+        self.assertTrue(all(article.is_synthetic for article in NewsArticle.objects.all()))
+
+        items = [{'url': 'https://news.example.com/a', 'title': 'Metro line opens'}]
+        with mock.patch.object(news, 'fetch_news_articles', return_value=items):
+            self.assertEqual(news.ingest_news('Delhi'), 1)
+        self.assertEqual([article.title for article in NewsArticle.objects.all()], ['Metro line opens'])
+
+        # Once real articles are stored, an outage keeps them instead of adding placeholders
+        with mock.patch.object(news, 'fetch_news_articles', side_effect=Exception('offline')):
+            self.assertEqual(news.ingest_news('Delhi'), 0)
+        self.assertEqual(NewsArticle.objects.count(), 1)
+
+    def test_parse_published(self):
+        self.assertTrue(timezone.is_aware(news.parse_published('2024-05-01T08:00:00')))
+        self.assertLess(timezone.now() - news.parse_published('yesterday'), timedelta(seconds=5))
+
+    @mock.patch.object(news, 'fetch_news_articles')
+    def test_news_page_never_fetches_inline(self, fetch_news_articles):
+        response = self.client.get(reverse('news'), {'city': 'Delhi'})
+        self.assertContains(response, 'has not been fetched yet')
+
+        make_article('Metro line opens', city='Kolkata')
+        response = self.client.get(reverse('news'), {'city': 'Kolkata', 'q': 'metro'})
+        self.assertContains(response, 'Metro line opens')
+        fetch_news_articles.assert_not_called()
+
+    def test_news_api(self):
+        make_article('Metro line opens', days_ago=1)
+        make_article('Synthetic story', url=f'{NewsArticle.SYNTHETIC_PREFIX}Delhi/1')
+
+        data = self.client.get(reverse('news_api'), {'city': 'Delhi', 'limit': 1}).json()
+        self.assertEqual(data['rows'][0][data['columns'].index('url')], None)
+        self.assertIsNotNone(data['next'])
+
+        data = self.client.get(reverse('news_api'), {'city': 'Delhi', 'after': data['next']}).json()
+        self.assertEqual([row[data['columns'].index('title')] for row in data['rows']], ['Metro line opens'])
+        self.assertIsNone(data['next'])
+
+        self.assertEqual(self.client.get(reverse('news_api'), {'limit': 'many'}).status_code, 400)
@@ -19,4 +19,14 @@ urlpatterns = [
     # AJAX endpoints
     path('predict-ajax/', views.predict_ajax, name='predict_ajax'),
     
+    # API endpoints
+    path('api/scenarios/', views.scenario_list_api, name='scenario_list_api'),
+    path('api/scenarios/<int:scenario_id>/', views.scenario_detail_api, name='scenario_detail_api'),
+    path('api/admission-stats/', views.admission_stats_api, name='admission_stats_api'),
+    path('api/live/<str:city>/', views.live_congestion_stream, name='live_congestion'),
+    path('api/news/', views.news_api, name='news_api'),
+    
+    # Heatmap tiles
+    path('tiles/<str:city>/<int:hour>/<int:z>/<int:x>/<int:y>', views.heatmap_tile, name='heatmap_tile'),
+    
 ] 
\ No newline at end of file
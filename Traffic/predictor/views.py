@@ -1,19 +1,45 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from urllib.parse import urlencode
 import json
+import math
 import random
-import requests
-from datetime import datetime, timedelta
 
-from .models import Prediction
-from .services.model import predictor
+from .caching import NEWS_CACHE_TIMEOUT, cached_page
+from .db import use_read_replica
+from .models import Location, NewsArticle, Prediction, SavedScenario
+from .pagination import decode_cursor
+from .serializers import InvalidFields, api_response, parse_fields, serialize_prediction, serialize_rows
+from .services import admission, live, news, tiles
+from .services.deadline import Deadline, InvalidBudget, deadline_from_request, get_setting as get_budget_setting
+from .services.model import CITY_COORDS
+from .services.scenarios import serialize_forecast
 
 
+# How each predict_traffic stage in result['degraded_stages'] is described to users
+DEGRADED_STAGE_LABELS = {
+    'geocode': 'location lookup',
+    'weather': 'live weather',
+    'inference': 'the ML model',
+}
+
+
+def news_cache_namespace(request):
+    """Per-city cache namespace for the news list and article pages, following the stored articles"""
+    city = request.GET.get('city', 'Delhi')
+    return f"news:{city}:{news.stored_version(city)}"
+
+
+@cached_page('pages')
 def home(request):
     """Home page with hero section and feature cards"""
     return render(request, 'predictor/home.html')
@@ -28,20 +54,42 @@ def predict_view(request):
         source = request.POST.get('source')
         destination = request.POST.get('destination')
         
-        if city and source and destination:
+        if city and city not in cities:
+            messages.error(request, 'Please choose a supported city.')
+            context = {'cities': cities}
+        elif city and source and destination:
             # Make prediction
-            result = predictor.predict_traffic(city, source, destination)
+            try:
+                result = admission.admit_prediction(request, city, source, destination,
+                                                    Deadline(get_budget_setting('DEFAULT')))
+            except admission.RateLimited as e:
+                messages.error(request, 'Too many prediction requests. Please try again in a few seconds.')
+                response = render(request, 'predictor/predict.html', {'cities': cities}, status=429)
+                response['Retry-After'] = str(math.ceil(e.retry_after))
+                return response
+            
+            if result.get('degraded'):
+                messages.warning(request, 'We are under heavy load, so this is a quick estimate without live weather, '
+                                          'distance or transport suggestion. It is not saved to your history.')
+            elif result.get('degraded_stages'):
+                stages = ', '.join(DEGRADED_STAGE_LABELS[stage] for stage in result['degraded_stages'])
+                messages.warning(request, f'Some live data was unavailable, so this estimate uses fallbacks for: {stages}.')
             
-            # Save prediction to database
-            prediction = Prediction.objects.create(
+            source_coords = result['coordinates']['source']
+            dest_coords = result['coordinates']['destination']
+            if result.get('degraded'):
+                # Quick estimates under load are shown but not kept in the prediction history
+                source_location = Location(name=source, latitude=source_coords[0], longitude=source_coords[1])
+                destination_location = Location(name=destination, latitude=dest_coords[0], longitude=dest_coords[1])
+            else:
+                source_location = Location.remember(source, source_coords, result['geocoded']['source'])
+                destination_location = Location.remember(destination, dest_coords, result['geocoded']['destination'])
+            
+            prediction = Prediction(
                 user=request.user if request.user.is_authenticated else None,
                 city=city,
-                source=source,
-                destination=destination,
-                source_lat=result['coordinates']['source'][0],
-                source_lon=result['coordinates']['source'][1],
-                dest_lat=result['coordinates']['destination'][0],
-                dest_lon=result['coordinates']['destination'][1],
+                source=source_location,
+                destination=destination_location,
                 distance_km=result['features']['distance_km'],
                 hour=result['features']['hour'],
                 weekday=result['features']['weekday'],
@@ -49,14 +97,17 @@ def predict_view(request):
                 weather=result['features']['weather'],
                 event_flag=result['features']['event'],
                 route_type=result['features']['route_type'],
-                congestion_level=result['congestion_level'],
+                congestion_level=str(result['congestion_level']),
                 suggested_mode=result['suggested_mode']
             )
+            if not result.get('degraded'):
+                prediction.save()
             
             context = {
                 'cities': cities,
                 'prediction': prediction,
                 'result': result,
+                'heatmap_tile_url': tiles.tile_url_template(city, prediction.hour) if city in tiles.CITY_BOUNDS else None,
                 'show_result': True
             }
         else:
@@ -78,130 +129,161 @@ def predict_ajax(request):
         destination = data.get('destination')
         
         if city and source and destination:
-            result = predictor.predict_traffic(city, source, destination)
-            return JsonResponse(result)
+            try:
+                fields = parse_fields(request.GET.get('fields') or data.get('fields'))
+                deadline = deadline_from_request(request)
+            except (InvalidFields, InvalidBudget) as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            
+            try:
+                result = admission.admit_prediction(request, city, source, destination, deadline)
+            except admission.RateLimited as e:
+                response = JsonResponse({'error': 'Too many requests', 'reason': e.reason}, status=429)
+                response['Retry-After'] = str(math.ceil(e.retry_after))
+                return response
+            return api_response(serialize_prediction(result, fields))
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+async def live_congestion_stream(request, city):
+    """Server-sent events with periodic congestion for a city, or one of the user's saved routes with ?scenario="""
+    # WSGI handlers drain async iterators before sending anything, so the stream would never start
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live congestion needs the ASGI application, '
+                                      'e.g. uvicorn traffic_predictor.asgi:application'}, status=501)
+    if city not in CITY_COORDS:
+        return JsonResponse({'error': 'Unknown city'}, status=404)
+    
+    source = destination = None
+    scenario_id = request.GET.get('scenario')
+    if scenario_id:
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Log in to follow a saved route'}, status=403)
+        scenario = None
+        if scenario_id.isdigit():
+            scenario = await SavedScenario.objects.filter(id=scenario_id, user=user, city=city).afirst()
+        if scenario is None:
+            return JsonResponse({'error': 'Unknown scenario'}, status=404)
+        source, destination = scenario.source, scenario.destination
+    
+    if not live.feed_available(city, source, destination):
+        response = JsonResponse({'error': 'Too many live feeds'}, status=503)
+        response['Retry-After'] = str(live.LIVE_INTERVAL)
+        return response
+    
+    response = StreamingHttpResponse(
+        live.event_stream(city, source, destination), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def heatmap_tile(request, city, hour, z, x, y):
+    """Congestion overlay tile rendered from the precomputed grid for a city and hour"""
+    if city not in tiles.CITY_BOUNDS or not 0 <= hour < 24 or not tiles.valid_tile(z, x, y):
+        raise Http404('Unknown tile')
+    loaded = tiles.load_grid(city, hour)
+    if loaded is None:
+        raise Http404('Tiles not built')
+    version, grid = loaded
+    
+    etag = f'"{version}-{city}-{hour}-{z}-{x}-{y}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f'tile:{city}:{hour}:{version}:{z}:{x}:{y}'
+        png = cache.get(cache_key)
+        if png is None:
+            png = tiles.render_tile(city, grid, z, x, y)
+            cache.set(cache_key, png, 60 * 60 * 24)
+        response = HttpResponse(png, content_type='image/png')
+    
+    response['ETag'] = etag
+    # Versioned URLs never change content; unversioned ones are revalidated hourly
+    if request.GET.get('v') == version:
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+@staff_member_required
+def admission_stats_api(request):
+    """Counters for admitted, degraded, shed and rate-limited prediction requests"""
+    return JsonResponse(admission.stats.snapshot())
+
+
+@cached_page(news_cache_namespace, version_timeout=NEWS_CACHE_TIMEOUT)
 def news_view(request):
-    """Traffic news page"""
+    """Traffic news page: stored articles for a city, newest first, with ?q= search"""
     cities = ['Delhi', 'Mumbai', 'Bengaluru', 'Hyderabad', 'Chennai', 'Kolkata']
     selected_city = request.GET.get('city', 'Delhi')
+    search_query = request.GET.get('q', '').strip()
+    cursor = decode_cursor(request.GET.get('after'))
     
-    # Try to fetch news from NewsAPI
-    news_articles = []
-    try:
-        # You can add your NewsAPI key here
-        api_key = "your_newsapi_key"  # Replace with actual key
-        query = f"traffic {selected_city}"
-        url = f"https://newsapi.org/v2/everything?q={query}&language=en&sortBy=publishedAt&apiKey={api_key}"
-        
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            news_articles = data.get('articles', [])[:10]
-        else:
-            raise Exception("API request failed")
-    except Exception as e:
-        print(f"News API error: {e}")
-        # Fallback: generate synthetic news
-        news_articles = generate_synthetic_news(selected_city)
+    # Articles come from the news fetcher only; browsing never calls NewsAPI
+    news_articles, next_cursor = news.articles_page(selected_city, search_query, cursor)
     
     context = {
         'cities': cities,
         'selected_city': selected_city,
-        'news_articles': news_articles
+        'search_query': search_query,
+        'news_articles': news_articles,
+        'not_fetched': not news_articles and not search_query and cursor is None,
+        'first_page_url': f"?{urlencode({'city': selected_city, 'q': search_query})}" if cursor else None,
+        'next_page_url': f"?{urlencode({'city': selected_city, 'q': search_query, 'after': next_cursor})}"
+                         if next_cursor else None,
     }
     return render(request, 'predictor/news.html', context)
 
 
-def generate_synthetic_news(city):
-    """Generate synthetic traffic news when API is unavailable"""
-    headlines_and_content = [
-        {
-            'title': f"Traffic congestion expected on major roads in {city} during peak hours",
-            'content': f"Commuters in {city} are advised to plan their journeys carefully as traffic congestion is expected on major arterial roads during peak hours today. The traffic police have identified several bottlenecks including main intersections and highway entry points. Alternative routes are recommended for faster travel."
-        },
-        {
-            'title': f"New metro line to reduce traffic in {city} by 30%",
-            'content': f"The newly inaugurated metro line in {city} is expected to significantly reduce road traffic by up to 30% according to transport authorities. The line connects major commercial and residential areas, providing commuters with a faster and more reliable alternative to road transport."
-        },
-        {
-            'title': f"Smart traffic signals installed across {city} to improve flow",
-            'content': f"The {city} municipal corporation has installed AI-powered smart traffic signals at 50 major intersections. These signals adapt to real-time traffic conditions and are expected to reduce waiting times by 25% and improve overall traffic flow throughout the city."
-        },
-        {
-            'title': f"Construction work on {city} highways may cause delays",
-            'content': f"Ongoing construction work on major highways in {city} may cause significant delays for commuters over the next two weeks. The public works department advises using alternative routes and allowing extra travel time. Work is being conducted during off-peak hours where possible."
-        },
-        {
-            'title': f"Traffic police launch new initiative to reduce congestion in {city}",
-            'content': f"The {city} traffic police have launched a comprehensive initiative to tackle traffic congestion. The program includes deployment of additional personnel at key intersections, improved signal timing, and a public awareness campaign about traffic rules and safe driving practices."
-        },
-        {
-            'title': f"Public transport usage increases in {city} as fuel prices rise",
-            'content': f"With rising fuel prices, more commuters in {city} are switching to public transport. Bus ridership has increased by 15% over the past month, while metro usage has grown by 20%. Transport authorities are considering increasing service frequency to meet growing demand."
-        },
-        {
-            'title': f"New flyover project to ease traffic in {city} city center",
-            'content': f"A new flyover project in {city} city center is set to begin next month. The project aims to reduce traffic congestion at one of the busiest intersections in the city. The flyover is expected to be completed within 18 months and will significantly improve traffic flow."
-        },
-        {
-            'title': f"Traffic advisory issued for {city} due to upcoming festival",
-            'content': f"The {city} traffic police have issued an advisory for the upcoming festival celebrations. Several roads will be closed or have restricted access. Commuters are advised to use public transport and avoid the city center during festival hours. Additional parking arrangements have been made."
-        },
-        {
-            'title': f"Bike lanes to be expanded across {city} to promote cycling",
-            'content': f"The {city} municipal corporation has announced plans to expand dedicated bike lanes across the city. The initiative aims to promote cycling as an eco-friendly mode of transport and reduce vehicular traffic. The project will cover 100 kilometers of roads over the next year."
-        },
-        {
-            'title': f"Traffic monitoring system upgraded in {city} with AI technology",
-            'content': f"The traffic monitoring system in {city} has been upgraded with artificial intelligence technology. The new system can predict traffic patterns, detect accidents in real-time, and automatically adjust signal timings. This is expected to reduce travel time by up to 20%."
-        }
-    ]
-    
-    sources = ['Times of India', 'Hindustan Times', 'The Hindu', 'Economic Times', 'Indian Express']
-    
-    news_articles = []
-    for i, article_data in enumerate(headlines_and_content):
-        news_articles.append({
-            'title': article_data['title'],
-            'content': article_data['content'],
-            'source': {'name': random.choice(sources)},
-            'url': f"/news/article/{i+1}/",
-            'publishedAt': (datetime.now() - timedelta(days=random.randint(1, 7))).isoformat()
-        })
+def news_api(request):
+    """Stored news articles as JSON: ?city=, ?q= full-text search and ?after= cursor"""
+    try:
+        limit = min(max(int(request.GET.get('limit', news.PAGE_SIZE)), 1), 100)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
     
-    return news_articles
+    cursor = decode_cursor(request.GET.get('after'))
+    articles, next_cursor = news.articles_page(request.GET.get('city'), request.GET.get('q', ''), cursor, limit)
+    rows = [{
+        'id': article.id,
+        'city': article.city,
+        'title': article.title,
+        'description': article.description,
+        'source': article.source_name,
+        'url': None if article.is_synthetic else article.url,
+        'published_at': article.published_at,
+    } for article in articles]
+    data = serialize_rows(rows, ['id', 'city', 'title', 'description', 'source', 'url', 'published_at'])
+    data['next'] = next_cursor
+    return api_response(data)
 
 
+@cached_page(news_cache_namespace, version_timeout=NEWS_CACHE_TIMEOUT)
 def news_article_detail(request, article_id):
     """Display individual news article"""
-    # Get the synthetic news articles
-    news_articles = generate_synthetic_news("Delhi")  # Default city for article lookup
-    
     try:
-        article_index = int(article_id) - 1
-        if 0 <= article_index < len(news_articles):
-            article = news_articles[article_index]
-            context = {
-                'article': article,
-                'article_id': article_id
-            }
-            return render(request, 'predictor/news_detail.html', context)
-        else:
-            raise ValueError("Article not found")
-    except (ValueError, IndexError):
+        article = NewsArticle.objects.get(pk=article_id)
+    except NewsArticle.DoesNotExist:
         messages.error(request, 'Article not found.')
         return redirect('news')
+    
+    context = {
+        'article': article,
+        'article_id': article_id
+    }
+    return render(request, 'predictor/news_detail.html', context)
 
 
 @login_required
+@use_read_replica
 def dashboard_view(request):
     """User dashboard with recent predictions and charts"""
     # Get user's recent predictions
-    recent_predictions = Prediction.objects.filter(user=request.user)[:10]
+    recent_predictions = Prediction.objects.filter(user=request.user).select_related('source', 'destination')[:10]
     
     # Calculate congestion statistics based on actual predictions
     all_user_predictions = Prediction.objects.filter(user=request.user)
@@ -213,8 +295,12 @@ def dashboard_view(request):
     # Generate chart data
     chart_data = generate_chart_data()
     
+    # Saved routes with their precomputed forecasts
+    saved_scenarios = SavedScenario.objects.filter(user=request.user).select_related('forecast')
+    
     context = {
         'recent_predictions': recent_predictions,
+        'saved_scenarios': saved_scenarios,
         'chart_data': chart_data,
         'total_predictions': total_predictions,
         'low_congestion': low_congestion,
@@ -224,6 +310,25 @@ def dashboard_view(request):
     return render(request, 'predictor/dashboard.html', context)
 
 
+@login_required
+@use_read_replica
+def scenario_list_api(request):
+    """Precomputed forecasts for all of the user's saved scenarios"""
+    scenarios = SavedScenario.objects.filter(user=request.user).select_related('forecast')
+    compact = request.GET.get('compact') == '1'
+    return api_response({'scenarios': [serialize_forecast(scenario, compact) for scenario in scenarios]})
+
+
+@login_required
+@use_read_replica
+def scenario_detail_api(request, scenario_id):
+    """Precomputed forecast for one saved scenario"""
+    scenario = get_object_or_404(
+        SavedScenario.objects.select_related('forecast'), id=scenario_id, user=request.user
+    )
+    return api_response(serialize_forecast(scenario, request.GET.get('compact') == '1'))
+
+
 def generate_chart_data():
     """Generate synthetic chart data for dashboard"""
     # Peak hour trend data
@@ -253,6 +358,7 @@ def generate_chart_data():
     }
 
 
+@cached_page('pages')
 def about_view(request):
     """About page with ML workflow explanation"""
     return render(request, 'predictor/about.html')
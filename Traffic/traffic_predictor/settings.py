@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Before the session middleware, so session writes pin the client to the primary
+    'predictor.db.ReadReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,6 +81,60 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Persistent connections leak under ASGI (Django ticket #33497): every request
+        # runs its queries on a new thread, so close them at the end of each request
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            # Seconds to wait for a lock before raising "database is locked"
+            'timeout': 20,
+        },
+    },
+}
+
+# Optional read replica for read-heavy views (dashboard, admin, scenario API).
+# DB_REPLICA_NAME may be a replica file or the primary file itself, which is
+# then opened read-only on a separate connection.
+if os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{os.environ['DB_REPLICA_NAME']}?mode=ro",
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['predictor.db.ReadReplicaRouter']
+
+# Applied to every new SQLite connection. WAL lets readers run alongside a
+# writer; synchronous=NORMAL is durable across application crashes in WAL mode
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+}
+
+# Safe (GET/HEAD) requests under these paths read from the replica
+READ_REPLICA_PATHS = ['/admin/']
+# Seconds a client reads from the primary after a request that wrote
+READ_REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Page responses, news and template fragments; switch to Redis or Memcached to
+# share entries (and invalidations) between worker processes
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'traffic-predictor',
     }
 }
 
@@ -130,3 +186,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Login/Logout URLs
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Admin changelist for large Prediction tables: estimated counts, cached filter
+# choices and keyset pagination instead of COUNT(*) and OFFSET paging
+PREDICTION_ADMIN_HIGH_VOLUME = True
+
+# Admission control for /predict/ and /predict-ajax/: per-client token buckets
+# and a per-process cap on concurrent full predictions. Saturated requests get a
+# degraded fallback prediction ('degrade') or a fast 429 ('reject').
+PREDICTION_ADMISSION = {
+    'RATE': 1.0,
+    'BURST': 10,
+    'MAX_CONCURRENT': 8,
+    'QUEUE_TIMEOUT': 0.5,
+    'SHED_MODE': 'degrade',
+}
+
+# Candidate models trialled against live traffic: name -> pickle path. Each
+# live prediction is queued for background scoring (dropped when the queue is
+# full) and agreement/latency per window is recorded in ShadowEvaluation.
+SHADOW_MODELS = {}
+SHADOW_EVALUATION = {
+    'WORKERS': 1,
+    'QUEUE_SIZE': 1000,
+    'BATCH_SIZE': 64,
+    'BATCH_WAIT': 0.5,
+    'FLUSH_INTERVAL': 60,
+}
+
+# Latency budget for a prediction, in seconds. Geocoding, weather and inference
+# each get the time left and fall back to cached coordinates, synthetic weather
+# or the fallback model when it runs out. API clients can send a budget in the
+# X-Latency-Budget-Ms header, capped at MAX.
+PREDICTION_LATENCY_BUDGET = {
+    'DEFAULT': 3.0,
+    'MAX': 10.0,
+    'INFERENCE_RESERVE': 0.05,
+}
+
+# Seconds between shared predictions for each city/route on the live SSE stream,
+# and the number of distinct city/route feeds allowed per process
+LIVE_CONGESTION_INTERVAL = 60
+LIVE_CONGESTION_MAX_FEEDS = 50
+
+# Precomputed congestion heatmap grids, written by `manage.py build_heatmap_tiles`
+HEATMAP_TILES_ROOT = BASE_DIR / 'tiles'